@@ -1,13 +1,49 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+from applications.auth.password_handler import PasswordEncrypt
+from applications.auth.refresh_tokens import refresh_store
 from applications.auth.router import router_auth
 from applications.Projects.router import router_projects
 from applications.users.router import router_users
+from database.query_counter import QueryBudgetExceeded, QueryCountMiddleware
+from services.cache.cache import cache
+from services.counters.counter_buffer import likes_counter
+from services.images.variants import ImageVariants
+from services.outbox.relay import outbox_relay
+from services.rabbit.rabbitmq_service import rabbitmq_publisher
+from services.s3.s3 import s3_storage
 from settings import settings
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await rabbitmq_publisher.start()
+    await s3_storage.start()
+    outbox_relay.start()
+    likes_counter.start()
+    yield
+    await likes_counter.stop()
+    await outbox_relay.stop()
+    await rabbitmq_publisher.stop()
+    await s3_storage.stop()
+    await cache.close()
+    await refresh_store.close()
+    PasswordEncrypt.executor.shutdown(wait=True)
+    ImageVariants.executor.shutdown(wait=True)
+
+
+async def query_budget_exceeded_handler(request: Request, error: QueryBudgetExceeded) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"detail": str(error)})
+
+
 def get_application() -> FastAPI:
-    app = FastAPI(root_path="/api", root_path_in_servers=True, debug=settings.DEBUG)
+    app = FastAPI(root_path="/api", root_path_in_servers=True, debug=settings.DEBUG, lifespan=lifespan)
+    if settings.QUERY_BUDGET_CHECK:
+        app.add_middleware(QueryCountMiddleware)
+        app.add_exception_handler(QueryBudgetExceeded, query_budget_exceeded_handler)
 
     app.include_router(router_users, prefix="/users", tags=["Users"])
     app.include_router(router_projects, prefix="/projects", tags=["Projects"])
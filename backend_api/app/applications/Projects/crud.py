@@ -1,17 +1,41 @@
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import asc, desc, select, func, or_, and_
+from sqlalchemy import asc, desc, select, delete, exists, func, or_, and_, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+import base64
 import math
-from sqlalchemy.orm import joinedload
+import re
+from datetime import datetime
+from sqlalchemy.orm import joinedload, load_only
 
-from applications.Projects.schemas import SearchParamsSchema, SortEnum, SortByEnum, CommentCreate
+from applications.Projects.schemas import SearchParamsSchema, SortEnum, SortByEnum, CommentCreate, CountModeEnum, \
+    SearchModeEnum
 
-from applications.Projects.models_projects import Project, ProjectComments
+from applications.Projects.models_projects import Project, ProjectComments, ProjectLike
+from applications.users.models import User
 from sqlalchemy.orm import selectinload
+from services.cache.cache import cache
+from services.counters.counter_buffer import likes_counter
+from services.outbox.models import add_outbox_event
+from services.rabbit.constants import SupportedQueues
 
+SEARCH_CONFIG = "simple"
 
-async def create_project_in_db(user_id, project_uuid, project_name, category, Additional_information, description, technologies, detailed_description, main_image, images, session) -> Project:
+## columns needed to render a project card, list views skip the long text columns
+PROJECT_LIST_COLUMNS = (
+    Project.id, Project.user_id, Project.project_name, Project.category, Project.description,
+    Project.technologies, Project.main_image, Project.created_at, Project.count_of_likes, Project.image_variants,
+)
+
+
+def project_cache_key(pk: int) -> str:
+    return f"project:{pk}"
+
+
+async def create_project_in_db(user_id, project_uuid, project_name, category, Additional_information, description, technologies, detailed_description, main_image, images, session, image_variants=None) -> Project:
     new_project = Project(
         uuid_data=project_uuid,
         user_id=user_id,
@@ -23,51 +47,191 @@ async def create_project_in_db(user_id, project_uuid, project_name, category, Ad
         Additional_information=Additional_information,
         main_image=main_image,
         images=images,
+        image_variants=image_variants or {},
     )
     session.add(new_project)
     await session.commit()
     return new_project
 
 
-async def get_project_data(params: SearchParamsSchema, session: AsyncSession):
-    query = select(Project)
-    count_query = select(func.count()).select_from(Project)
+def encode_cursor(project: Project) -> str:
+    raw = f"{project.created_at.isoformat()}|{project.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    order_direction = asc if params.order_direction == SortEnum.ASC else desc
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, project_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(project_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def count_projects(filters: list, count_mode: CountModeEnum, session: AsyncSession) -> int | None:
+    if count_mode == CountModeEnum.NONE:
+        return None
+
+    if count_mode == CountModeEnum.ESTIMATE:
+        if filters:
+            return None
+        result = await session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table_name"),
+            {"table_name": Project.__tablename__}
+        )
+        estimate = result.scalar()
+        ## reltuples is -1 until the table has been vacuumed or analyzed
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    count_query = select(func.count()).select_from(Project).filter(*filters)
+    result_count = await session.execute(count_query)
+    return result_count.scalar()
+
+
+def build_fulltext_query(q: str):
+    ## every word is matched as a prefix, so "fast" finds "fastapi"
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+
+async def get_project_data(params: SearchParamsSchema, session: AsyncSession):
+    filters = []
+    rank = None
     if params.q:
         search_fields = [Project.project_name, Project.description]
         if params.use_sharp_q_filter:
             cleaned_query = params.q.strip().lower()
             search_condition = [func.lower(search_field) == cleaned_query for search_field in search_fields]
-            query = query.filter(or_(*search_condition))
-            count_query = count_query.filter(or_(*search_condition))
+            filters.append(or_(*search_condition))
+        elif params.search_mode == SearchModeEnum.FULLTEXT:
+            ts_query = build_fulltext_query(params.q)
+            if ts_query is not None:
+                filters.append(Project.search_vector.op("@@")(ts_query))
+                rank = func.ts_rank(Project.search_vector, ts_query)
+        elif params.search_mode == SearchModeEnum.TRIGRAM:
+            cleaned_query = params.q.strip()
+            ## the % operator reads its threshold from this setting, it is what lets postgres use the trigram index
+            await session.execute(
+                select(func.set_config("pg_trgm.similarity_threshold", str(params.similarity_threshold), True))
+            )
+            filters.append(or_(Project.project_name.op("%")(cleaned_query), Project.category.op("%")(cleaned_query)))
+            rank = func.greatest(
+                func.similarity(Project.project_name, cleaned_query),
+                func.similarity(Project.category, cleaned_query)
+            )
         else:
             words = [word for word in params.q.strip().split() if len(word) > 1]
             search_condition = or_(
                 and_(*(search_field.icontains(word) for word in words)) for search_field in search_fields
             )
-            query = query.filter(search_condition)
-            count_query = count_query.filter(search_condition)
+            filters.append(search_condition)
 
-    result = await session.execute(query)
-    result_count = await session.execute(count_query)
-    total = result_count.scalar()
+    order_direction = asc if params.order_direction == SortEnum.ASC else desc
+    query = select(Project).options(load_only(*PROJECT_LIST_COLUMNS)).filter(*filters)
+    if rank is not None:
+        if params.cursor:
+            raise HTTPException(status_code=400, detail="Cursor is not supported for ranked search")
+        query = query.order_by(rank.desc(), Project.id.desc())
+    else:
+        query = query.order_by(order_direction(Project.created_at), order_direction(Project.id))
+
+    if params.cursor:
+        cursor_key = tuple_(*decode_cursor(params.cursor))
+        project_key = tuple_(Project.created_at, Project.id)
+        query = query.filter(project_key > cursor_key if params.order_direction == SortEnum.ASC
+                             else project_key < cursor_key)
+    else:
+        query = query.offset((params.page - 1) * params.limit)
+
+    ## one extra row tells whether there is a next page without counting
+    result = await session.execute(query.limit(params.limit + 1))
+    items = result.scalars().all()
+    has_next = len(items) > params.limit
+    items = items[:params.limit]
+
+    total = await count_projects(filters, params.count_mode, session)
 
     return {
-        "items": result.scalars().all(),
+        "items": items,
         "total": total,
-        'page': params.page,
+        'page': None if params.cursor else params.page,
         'limit': params.limit,
-        'pages': math.ceil(total / params.limit)
+        'pages': math.ceil(total / params.limit) if total is not None else None,
+        'has_next': has_next,
+        ## the cursor is a (created_at, id) key, ranked results are ordered by rank and page with page instead
+        'next_cursor': encode_cursor(items[-1]) if has_next and rank is None else None
     }
 
 
-
 async def get_project_by_pk(pk: int, session: AsyncSession) -> Project | None:
     query = select(Project).filter(Project.id == pk)
     result = await session.execute(query)
     return result.scalar_one_or_none()
 
+async def get_project_info(pk: int, session: AsyncSession) -> dict | None:
+    project = await get_project_by_pk(pk, session)
+    if not project:
+        return None
+
+    return jsonable_encoder({
+        "user_id": project.user_id,
+        "id": project.id,
+        "project_name": project.project_name,
+        "category": project.category,
+        "description": project.description,
+        "technologies": project.technologies,
+        "detailed_description": project.detailed_description,
+        "main_image": project.main_image,
+        "created_at": project.created_at,
+        "images": project.images,
+        "image_variants": project.image_variants,
+        "count_of_likes": project.count_of_likes,
+        "Additional_information": project.Additional_information,
+    })
+
+
+async def get_comments_page(
+        project_id: int, limit: int, session: AsyncSession, before_id: int | None = None
+) -> tuple[list[dict], int, int | None]:
+    ## newest first, keyset on id. count(*) over () counts every comment older than the cursor next to the page rows,
+    ## so there is no separate count query and on the first page it is the total.
+    filters = [ProjectComments.project_id == project_id]
+    if before_id is not None:
+        filters.append(ProjectComments.id < before_id)
+    query = (
+        select(ProjectComments, User.name, func.count().over())
+        .join(User, User.id == ProjectComments.user_id)
+        .where(*filters)
+        .order_by(ProjectComments.id.desc())
+        .limit(limit)
+    )
+    result = await session.execute(query)
+    rows = result.all()
+
+    comments = [
+        {
+            "id": comment.id,
+            "text": comment.feedback,
+            "author": name,
+            "created_at": comment.created_at
+        }
+        for comment, name, _ in rows
+    ]
+    remaining = rows[0][2] if rows else 0
+    next_cursor = comments[-1]["id"] if remaining > len(comments) else None
+    return comments, remaining, next_cursor
+
+
+async def invalidate_projects_cache(project_ids: list[int]) -> None:
+    await cache.invalidate(*(project_cache_key(pk) for pk in project_ids))
+
+
+## flushed like counters change count_of_likes in the database, so the cached projects are stale now
+likes_counter.add_flush_listener(invalidate_projects_cache)
+
+
 async def create_comment(user_id: int, project_id: int, feedback: str, session: AsyncSession) -> ProjectComments:
     created_comment = ProjectComments(
         user_id=user_id,
@@ -77,4 +241,86 @@ async def create_comment(user_id: int, project_id: int, feedback: str, session:
 
     session.add(created_comment)
     await session.commit()
-    return created_comment
\ No newline at end of file
+    return created_comment
+
+async def _apply_like_change(project_id: int, changed_likes, delta: int, session: AsyncSession) -> int | None:
+    ## changed_likes is a CTE returning project_id only when the ledger row was really inserted or deleted,
+    ## so repeated clicks never move the counter. The projects row itself is updated later by likes_counter
+    query = (
+        select(
+            func.coalesce(Project.count_of_likes, 0),
+            exists(select(changed_likes.c.project_id)),
+            Project.project_name,
+            User.email,
+            User.name,
+        )
+        .outerjoin(User, User.id == Project.user_id)
+        .where(Project.id == project_id)
+    )
+    try:
+        result = await session.execute(query)
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=404, detail="Project not found")
+    row = result.one_or_none()
+    if row is None:
+        await session.commit()
+        return None
+
+    count_of_likes, is_changed, project_name, owner_email, owner_name = row
+    count_of_likes = max(count_of_likes + likes_counter.get_pending(project_id) + (delta if is_changed else 0), 0)
+    if is_changed and delta > 0 and owner_email:
+        add_outbox_event(
+            session,
+            queue_name=SupportedQueues.PROJECT_LIKED,
+            payload={
+                "project_id": project_id,
+                "project_name": project_name,
+                "owner_email": owner_email,
+                "owner_name": owner_name,
+                "count_of_likes": count_of_likes,
+            }
+        )
+    await session.commit()
+
+    if is_changed:
+        likes_counter.add(project_id, delta)
+    return count_of_likes
+
+
+async def get_count_of_likes(project_id: int, session: AsyncSession) -> int | None:
+    result = await session.execute(select(func.coalesce(Project.count_of_likes, 0)).where(Project.id == project_id))
+    count_of_likes = result.scalar_one_or_none()
+    if count_of_likes is None:
+        return None
+    return max(count_of_likes + likes_counter.get_pending(project_id), 0)
+
+
+async def like_project_in_db(user_id: int, project_id: int, session: AsyncSession) -> int | None:
+    inserted = (
+        insert(ProjectLike)
+        .values(user_id=user_id, project_id=project_id)
+        .on_conflict_do_nothing(index_elements=[ProjectLike.user_id, ProjectLike.project_id])
+        .returning(ProjectLike.project_id)
+        .cte("inserted")
+    )
+    return await _apply_like_change(project_id, inserted, 1, session)
+
+
+async def unlike_project_in_db(user_id: int, project_id: int, session: AsyncSession) -> int | None:
+    deleted = (
+        delete(ProjectLike)
+        .where(ProjectLike.user_id == user_id, ProjectLike.project_id == project_id)
+        .returning(ProjectLike.project_id)
+        .cte("deleted")
+    )
+    return await _apply_like_change(project_id, deleted, -1, session)
+
+
+async def get_liked_project_ids(user_id: int, project_ids: list[int], session: AsyncSession) -> list[int]:
+    query = select(ProjectLike.project_id).where(
+        ProjectLike.user_id == user_id,
+        ProjectLike.project_id.in_(project_ids)
+    )
+    result = await session.execute(query)
+    return list(result.scalars().all())
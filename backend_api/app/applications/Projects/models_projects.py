@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy import String, Text, ForeignKey
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from sqlalchemy import String, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -15,6 +15,14 @@ class ModelCommonMixin:
 
 class Project(ModelCommonMixin, Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_created_at_id", "created_at", "id"),
+        Index("ix_projects_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_projects_project_name_trgm", "project_name", postgresql_using="gin",
+              postgresql_ops={"project_name": "gin_trgm_ops"}),
+        Index("ix_projects_category_trgm", "category", postgresql_using="gin",
+              postgresql_ops={"category": "gin_trgm_ops"}),
+    )
 
     uuid_data: Mapped[uuid.UUID] = mapped_column(default=uuid.uuid4)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
@@ -25,14 +33,20 @@ class Project(ModelCommonMixin, Base):
     technologies: Mapped[str] = mapped_column(Text, nullable=True)
     main_image: Mapped[str] = mapped_column(nullable=True)
     images: Mapped[list[str]] = mapped_column(ARRAY(String), default=list, nullable=True)
+    ## {original url: {"thumb.webp": url, ...}} for main_image and images
+    image_variants: Mapped[dict] = mapped_column(JSONB, default=dict, server_default="{}", nullable=False)
     detailed_description: Mapped[str] = mapped_column(Text, nullable=True)
     Additional_information: Mapped[str] = mapped_column(Text, nullable=True)
-    user = relationship("User", back_populates="projects", lazy="selectin")
+    ## relationships never load implicitly, queries ask for them with selectinload/joinedload
+    user = relationship("User", back_populates="projects", lazy="raise")
     count_of_likes: Mapped[int] = mapped_column(default=0, nullable=True)
+    ## filled by the projects_search_vector_update trigger, see migration 7d1f0a3c5e82
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     comments_relation = relationship(
         "ProjectComments",
         back_populates="project",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        lazy="raise"
     )
 
     def __str__(self):
@@ -46,7 +60,17 @@ class ProjectComments(ModelCommonMixin, Base):
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
     feedback: Mapped[str] = mapped_column(Text, nullable=True)
 
-    project = relationship("Project", back_populates="comments_relation")
+    project = relationship("Project", back_populates="comments_relation", lazy="raise")
+
+
+class ProjectLike(ModelCommonMixin, Base):
+    __tablename__ = "project_likes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "project_id", name="uq_project_likes_user_id_project_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), index=True)
 
 
 class UserProject(ModelCommonMixin, Base):
@@ -1,24 +1,37 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, status, Body, UploadFile, HTTPException, Form, File
+from fastapi import APIRouter, Depends, status, Body, UploadFile, HTTPException, Form, File, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from services.s3.s3 import s3_storage
+from services.images.variants import ImageVariants
+from services.cache.cache import cache
+from services.counters.counter_buffer import likes_counter
+from services.outbox.models import add_outbox_event
+from services.s3.models import add_object_references
+from services.rabbit.constants import SupportedQueues
 from applications.Projects.models_projects import Project
 from database.session_dependencies import get_async_session
+from database.query_counter import query_budget
 import uuid
 from sqlalchemy import Text, and_, delete
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, load_only
 from applications.Projects.crud import create_project_in_db, get_project_data, create_comment, \
-    get_project_data, get_project_by_pk
-from applications.Projects.schemas import ProjectSchema, SearchParamsSchema, CommentResponse, CommentCreate
+    get_project_data, get_project_by_pk, like_project_in_db, unlike_project_in_db, get_liked_project_ids, \
+    get_count_of_likes, get_project_info, invalidate_projects_cache, project_cache_key, PROJECT_LIST_COLUMNS, \
+    get_comments_page
+from applications.Projects.schemas import ProjectSchema, SearchParamsSchema, CommentResponse, CommentCreate, \
+    LikeStateResponse, LikedProjectsResponse
 from applications.users.models import User
+from applications.users.crud import author_cache_key, get_author_info
 from sqlalchemy import select
 from applications.Projects.models_projects import ProjectComments
-from applications.auth.security import get_current_user
+from applications.auth.principal import Principal
+from applications.auth.security import admin_required, get_current_user, get_optional_current_user
 
 router_projects = APIRouter()
 
 
 @router_projects.post("/create",
+                      dependencies=[Depends(query_budget(4))]
                       # dependencies=[Depends(admin_required)]
                       )
 async def create_project(
@@ -34,27 +47,27 @@ async def create_project(
         session: AsyncSession = Depends(get_async_session)
 ) -> ProjectSchema:
     project_uuid = uuid.uuid4()
-    main_image = await s3_storage.upload_product_image(main_image, restaurant_uuid=project_uuid)
-    images = images or []
-    images_urls = []
-    for image in images:
-        url = await s3_storage.upload_product_image(image, restaurant_uuid=project_uuid)
-        images_urls.append(url)
-
-    created_project = await  create_project_in_db(user_id=user.id, project_uuid=project_uuid, project_name=name,
-                                                  category=category,Additional_information=Additional_information,
-                                                  description=description, technologies=technologies,
-                                                  detailed_description=detailed_description,
-                                                  main_image=main_image, images=images_urls,
-                                                  session=session)
+    files = [main_image, *(images or [])]
+    uploaded_urls = await s3_storage.upload_product_images(files)
+    main_image, images_urls = uploaded_urls[0], uploaded_urls[1:]
+    image_variants = await ImageVariants.create_variants_for_files(files, uploaded_urls)
+
+    ## uploads were reserved at zero references by s3_storage, if this insert fails reclaim.py deletes them later
+    await add_object_references(session, uploaded_urls)
+    created_project = await create_project_in_db(user_id=user.id, project_uuid=project_uuid, project_name=name,
+                                                 category=category, Additional_information=Additional_information,
+                                                 description=description, technologies=technologies,
+                                                 detailed_description=detailed_description,
+                                                 main_image=main_image, images=images_urls,
+                                                 image_variants=image_variants, session=session)
 
     return created_project
 
 
-@router_projects.get('/by_category')
+@router_projects.get('/by_category', dependencies=[Depends(query_budget(1))])
 async def get_projects_by_category(category: str, session: AsyncSession = Depends(get_async_session)):
     result = await session.execute(
-        select(Project).where(Project.category == category)
+        select(Project).options(load_only(*PROJECT_LIST_COLUMNS)).where(Project.category == category)
     )
     projects = result.scalars().all()
     return {
@@ -63,66 +76,128 @@ async def get_projects_by_category(category: str, session: AsyncSession = Depend
     }
 
 
+@router_projects.get('/uploads/active', dependencies=[Depends(admin_required)])
+async def get_active_uploads() -> list[dict]:
+    return s3_storage.get_active_uploads()
+
+
+## Which of the given projects the current user liked, e.g. /projects/liked?project_ids=1&project_ids=2
+@router_projects.get('/liked', dependencies=[Depends(query_budget(2))])
+async def get_liked_projects(
+        project_ids: list[int] = Query(...),
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_async_session)
+) -> LikedProjectsResponse:
+    liked = await get_liked_project_ids(user.id, project_ids, session)
+    return LikedProjectsResponse(liked=liked)
+
+
+async def load_project_with_author(pk: int, session: AsyncSession) -> dict:
+    project = await cache.get_or_load(project_cache_key(pk), lambda: get_project_info(pk, session))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    author = None
+    if project["user_id"] is not None:
+        author = await cache.get_or_load(
+            author_cache_key(project["user_id"]), lambda: get_author_info(project["user_id"], session)
+        )
+
+    return project | {
+        "count_of_likes": max((project["count_of_likes"] or 0) + likes_counter.get_pending(pk), 0),
+        "author": author
+    }
+
+
 ## Get projects by primary key to upload in catalog
-@router_projects.get('/{pk}')
+@router_projects.get('/{pk}', dependencies=[Depends(query_budget(2))])
 async def get_project(
         pk: int,
         session: AsyncSession = Depends(get_async_session)
 ):
-    project = await get_project_by_pk(pk, session)
+    return await load_project_with_author(pk, session)
 
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
 
-    return {
-        "user_id": project.user_id,
-        "id": project.id,
-        "project_name": project.project_name,
-        "category": project.category,
-        "description": project.description,
-        "technologies": project.technologies,
-        "detailed_description": project.detailed_description,
-        "main_image": project.main_image,
-        "created_at": project.created_at,
-        "images": project.images,
-        "count_of_likes": project.count_of_likes,
-        "Additional_information": project.Additional_information,
-        "author": {
-            "id": project.user.id,
-            "name": project.user.name,
-            "email": project.user.email,
-            "followers": project.user.followers,
-            "profile_description": project.user.profile_description,
-            "subscriptions": project.user.subscriptions,
-            "user_avatar": project.user.user_avatar
-        }
+## Everything the project page needs in one call: project, author, first comments, likes and the caller's like
+@router_projects.get('/{pk}/page', dependencies=[Depends(query_budget(5))])
+async def get_project_page(
+        pk: int,
+        comments_limit: int = Query(20, ge=1, le=100),
+        comments_before: int | None = Query(None),
+        user: Principal | None = Depends(get_optional_current_user),
+        session: AsyncSession = Depends(get_async_session)
+):
+    project = await load_project_with_author(pk, session)
+    comments, comments_remaining, comments_next_cursor = await get_comments_page(
+        pk, comments_limit, session, before_id=comments_before
+    )
+    is_liked = user is not None and bool(await get_liked_project_ids(user.id, [pk], session))
+
+    return project | {
+        "comments": comments,
+        ## comments from the cursor on, the total when comments_before is not given
+        "comments_total": comments_remaining,
+        "comments_next_cursor": comments_next_cursor,
+        "is_liked": is_liked,
     }
 
 
+## Older comments of a project, newest first: /projects/1/comments?before=<comments_next_cursor>
+@router_projects.get('/{pk}/comments', dependencies=[Depends(query_budget(1))])
+async def get_project_comments(
+        pk: int,
+        before: int | None = Query(None),
+        limit: int = Query(20, ge=1, le=100),
+        session: AsyncSession = Depends(get_async_session)
+):
+    comments, remaining, next_cursor = await get_comments_page(pk, limit, session, before_id=before)
+    return {"comments": comments, "remaining": remaining, "next_cursor": next_cursor}
+
+
 ## Get projects by search
-@router_projects.get('/')
+@router_projects.get('/', dependencies=[Depends(query_budget(3))])
 async def get_projects(params: Annotated[SearchParamsSchema, Depends()],
                        session: AsyncSession = Depends(get_async_session)):
     result = await get_project_data(params, session)
     return result
 
 
-@router_projects.post('/create_comments', response_model=CommentResponse)
+@router_projects.post('/create_comments', response_model=CommentResponse, dependencies=[Depends(query_budget(5))])
 async def post_comments(
         feedback: CommentCreate,
-        user: User = Depends(get_current_user),
+        user: Principal = Depends(get_current_user),
         session: AsyncSession = Depends(get_async_session)
 ):
     project = await get_project_by_pk(feedback.project_id, session)
     if not project:
         raise HTTPException(status_code=404, detail="Ресторан не знайдено")
 
+    author = None
+    if project.user_id is not None:
+        author = await cache.get_or_load(
+            author_cache_key(project.user_id), lambda: get_author_info(project.user_id, session)
+        )
+    if author and author["id"] != user.id:
+        add_outbox_event(
+            session,
+            queue_name=SupportedQueues.PROJECT_COMMENTED,
+            payload={
+                "project_id": project.id,
+                "project_name": project.project_name,
+                "owner_email": author["email"],
+                "owner_name": author["name"],
+                "commenter_name": user.name,
+                "text": feedback.text,
+            }
+        )
+
     comment = await create_comment(
         user_id=user.id,
         project_id=feedback.project_id,
         feedback=feedback.text,
         session=session
     )
+    await invalidate_projects_cache([feedback.project_id])
 
     return CommentResponse(
         id=comment.id,
@@ -134,7 +209,7 @@ async def post_comments(
     )
 
 
-@router_projects.get("/comments/{project_id}")
+@router_projects.get("/comments/{project_id}", dependencies=[Depends(query_budget(1))])
 async def get_comments_for_project(
         project_id: int,
         session: AsyncSession = Depends(get_async_session)
@@ -158,51 +233,36 @@ async def get_comments_for_project(
     ]
 
 
-@router_projects.post("/like/{project_id}")
-async def like_project(project_id: int, session: AsyncSession = Depends(get_async_session)):
-    result = await session.execute(select(Project).filter(Project.id == project_id))
-    project = result.scalar_one_or_none()
-
-    if not project:
+@router_projects.post("/like/{project_id}", dependencies=[Depends(query_budget(2))])
+async def like_project(
+        project_id: int,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_async_session)
+) -> LikeStateResponse:
+    count_of_likes = await like_project_in_db(user.id, project_id, session)
+    if count_of_likes is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    if project.count_of_likes is None:
-        project.count_of_likes = 1
-    else:
-        project.count_of_likes += 1
+    return LikeStateResponse(count_of_likes=count_of_likes, is_liked=True)
 
-    await session.commit()
-    await session.refresh(project)
-    return project
 
-
-@router_projects.post("/unlike/{project_id}")
-async def unlike_project(project_id: int, session: AsyncSession = Depends(get_async_session)):
-    result = await session.execute(select(Project).filter(Project.id == project_id))
-    project = result.scalar_one_or_none()
-
-    if not project:
+@router_projects.post("/unlike/{project_id}", dependencies=[Depends(query_budget(2))])
+async def unlike_project(
+        project_id: int,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_async_session)
+) -> LikeStateResponse:
+    count_of_likes = await unlike_project_in_db(user.id, project_id, session)
+    if count_of_likes is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    if project.count_of_likes is None:
-        project.count_of_likes = 1
-    else:
-        project.count_of_likes -= 1
+    return LikeStateResponse(count_of_likes=count_of_likes, is_liked=False)
 
-    await session.commit()
-    await session.refresh(project)
-    return project
 
-
-@router_projects.get("/likes/{project_id}")
+@router_projects.get("/likes/{project_id}", dependencies=[Depends(query_budget(1))])
 async def get_all_likes_for_project(project_id: int, session: AsyncSession = Depends(get_async_session)):
-    result = await session.execute(select(Project).filter(Project.id == project_id))
-    project = result.scalar_one_or_none()
-
-    if not project:
+    likes = await get_count_of_likes(project_id, session)
+    if likes is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
-
-    likes = project.count_of_likes
     return likes
-
@@ -19,6 +19,7 @@ class ProjectSchema(BaseModel):
     images: list[str]
     user_id: int
     Additional_information: str
+    image_variants: dict[str, dict[str, str]] = {}
 
     class Config:
         from_attributes = True
@@ -41,6 +42,15 @@ class CommentResponse(BaseModel):
         from_attributes = True
 
 
+class LikeStateResponse(BaseModel):
+    count_of_likes: int
+    is_liked: bool
+
+
+class LikedProjectsResponse(BaseModel):
+    liked: list[int]
+
+
 class SortEnum(StrEnum):
     ASC = 'asc'
     DESC = 'desc'
@@ -51,10 +61,33 @@ class SortByEnum(StrEnum):
     PRICE = 'price'
 
 
+class SearchModeEnum(StrEnum):
+    ILIKE = 'ilike'
+    FULLTEXT = 'fulltext'
+    TRIGRAM = 'trigram'
+
+
+class CountModeEnum(StrEnum):
+    EXACT = 'exact'
+    ESTIMATE = 'estimate'
+    NONE = 'none'
+
+
 class SearchParamsSchema(BaseModel):
     q: Annotated[Optional[str], Field(default=None)] = None
     page: Annotated[int, Field(default=1, ge=1)]
     limit: Annotated[int, Field(default=10, ge=1, le=50)]
+    cursor: Optional[str] = Field(
+        default=None,
+        description='next_cursor of the previous page, replaces page. Only for ilike and sharp q search, '
+                    'ranked fulltext and trigram results page with page and return no next_cursor'
+    )
+    count_mode: CountModeEnum = Field(
+        default=CountModeEnum.EXACT,
+        description='exact runs COUNT(*), estimate uses planner statistics, none returns only has_next'
+    )
     order_direction: SortEnum = SortEnum.DESC
     sort_by: SortByEnum = SortByEnum.ID
     use_sharp_q_filter: bool = Field(default=False, description='used to search exact q')
+    search_mode: SearchModeEnum = Field(default=SearchModeEnum.ILIKE, description='engine used for not sharp q')
+    similarity_threshold: float = Field(default=0.3, ge=0, le=1, description='min similarity for trigram search')
@@ -1,19 +1,44 @@
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 
 import jwt
+from cryptography.hazmat.primitives import serialization
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from applications.auth.password_handler import PasswordEncrypt
+from applications.auth.principal import Principal, get_cached_principal
+from applications.auth.refresh_tokens import refresh_store
 from applications.users.crud import get_user_by_email
+from applications.users.models import User
 from settings import settings
 
+ASYMMETRIC_ALGORITHMS = {"EdDSA", "RS256", "RS384", "RS512", "PS256", "PS384", "PS512", "ES256", "ES384", "ES512"}
 
+
+## With an asymmetric algorithm every token carries the kid of its signing key and /auth/jwks publishes the
+## public keys, so other services verify tokens without calling us. Key rotation: deploy the new key as
+## JWT_PRIVATE_KEY with a new JWT_KEY_ID and move the old public key to JWT_PUBLIC_KEYS until the last token
+## signed with it expired.
 class AuthHandler:
     def __init__(self):
-        self.secret = settings.JWT_SECRET
         self.algorithm = settings.JWT_ALGORITHM
+        self.key_id = None
+
+        if self.algorithm in ASYMMETRIC_ALGORITHMS:
+            if not settings.JWT_PRIVATE_KEY:
+                raise ValueError(f"JWT_PRIVATE_KEY is required for {self.algorithm}")
+            private_key = serialization.load_pem_private_key(settings.JWT_PRIVATE_KEY.encode(), password=None)
+            self.key_id = settings.JWT_KEY_ID
+            self.signing_key = private_key
+            self.verify_keys = {
+                kid: serialization.load_pem_public_key(pem.encode()) for kid, pem in settings.JWT_PUBLIC_KEYS.items()
+            }
+            self.verify_keys[self.key_id] = private_key.public_key()
+        else:
+            self.signing_key = settings.JWT_SECRET
+            self.verify_keys = {None: settings.JWT_SECRET}
 
     async def get_login_token_pairs(self, data: OAuth2PasswordRequestForm, session: AsyncSession):
         user_email = data.username
@@ -23,36 +48,87 @@ class AuthHandler:
         if not user:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User not found")
 
-        is_valid_password = await PasswordEncrypt.verify_password(user_password, user.hashed_password)
+        is_valid_password, new_hash = await PasswordEncrypt.verify_and_update(user_password, user.hashed_password)
         if not is_valid_password:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Incorrect password")
 
-        tokens = await self.generate_token_pairs(user.email)
+        if new_hash:
+            user.hashed_password = new_hash
+            await session.commit()
+
+        tokens = await self.generate_token_pairs(user)
         return tokens
 
-    async def generate_token_pairs(self, user_email) -> dict:
-        payload = {"user_email": user_email}
-        access_token = await self.create_token(payload, timedelta(minutes=60))
-        refresh_token = await self.create_token(payload, timedelta(days=1))
+    async def generate_token_pairs(
+        self, user: User | Principal, family: str | None = None, previous_jti: str | None = None
+    ) -> dict:
+        jti = uuid.uuid4().hex
+        if family is None:
+            family = uuid.uuid4().hex
+            await refresh_store.start_family(family, jti)
+        else:
+            await refresh_store.rotate(family, previous_jti, jti)
+
+        payload = {"user_email": user.email}
+        ## non-sensitive claims so pages can show who is logged in without asking the backend
+        access_payload = payload | {"type": "access", "user_id": user.id, "name": user.name, "is_admin": user.is_admin}
+        refresh_payload = payload | {"type": "refresh", "jti": jti, "family": family}
+        access_token = await self.create_token(access_payload, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+        refresh_token = await self.create_token(refresh_payload, timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
         return {"access_token": access_token, "refresh_token": refresh_token}
 
+    async def refresh_token_pairs(self, refresh_token: str, session: AsyncSession) -> dict:
+        payload = await self.decode_token(refresh_token, token_type="refresh")
+        if not payload.get("family") or not payload.get("jti"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+        user = await get_cached_principal(payload["user_email"], session)
+        if not user:
+            await refresh_store.revoke(payload["family"])
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+        ## claims are rebuilt from the current user, so a renamed user or a new admin sees it on next refresh
+        return await self.generate_token_pairs(user, family=payload["family"], previous_jti=payload["jti"])
+
+    async def revoke_refresh_token(self, refresh_token: str) -> None:
+        try:
+            payload = await self.decode_token(refresh_token, token_type="refresh")
+        except HTTPException:
+            return
+        if payload.get("family"):
+            await refresh_store.revoke(payload["family"])
+
     async def create_token(self, payload: dict, expiry: timedelta) -> str:
-        now = datetime.now()
+        now = datetime.now(timezone.utc)
         time_payload = {"exp": now + expiry, "iat": now}
-        token = jwt.encode(payload | time_payload, self.secret, self.algorithm)
-        print(token)
+        headers = {"kid": self.key_id} if self.key_id else None
+        token = jwt.encode(payload | time_payload, self.signing_key, self.algorithm, headers=headers)
         return token
 
-    async def decode_token(self, token: str) -> dict:
+    async def decode_token(self, token: str, token_type: str = "access") -> dict:
         try:
-            payload = jwt.decode(token, self.secret, [self.algorithm])
+            key = self.verify_keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise jwt.InvalidTokenError("Unknown signing key")
+            payload = jwt.decode(token, key, [self.algorithm])
+            if payload.get("type", token_type) != token_type:
+                raise jwt.InvalidTokenError("Wrong token type")
             return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Time is out")
         except jwt.InvalidTokenError:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
+    def get_jwks(self) -> dict:
+        if self.key_id is None:
+            return {"keys": []}
 
-auth_handler = AuthHandler()
+        algorithm = jwt.get_algorithm_by_name(self.algorithm)
+        keys = []
+        for kid, key in self.verify_keys.items():
+            jwk = algorithm.to_jwk(key, as_dict=True)
+            keys.append(jwk | {"kid": kid, "alg": self.algorithm, "use": "sig"})
+        return {"keys": keys}
 
 
+auth_handler = AuthHandler()
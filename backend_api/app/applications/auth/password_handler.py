@@ -1,14 +1,69 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from settings import settings
+
 
 class PasswordEncrypt:
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    ## hashes below BCRYPT_ROUNDS are reported by verify_and_update and rehashed on the next login
+    pwd_context = CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    )
+
+    ## bcrypt releases the GIL, so a thread pool keeps the event loop free without process start-up costs
+    executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password_hash")
+    slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+    waiting = 0
+    active = 0
+    rejected = 0
+
+    @classmethod
+    async def run_in_pool(cls, func: Callable, *args):
+        if cls.waiting >= settings.PASSWORD_HASH_MAX_QUEUE:
+            cls.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, try again")
+
+        cls.waiting += 1
+        try:
+            await asyncio.wait_for(cls.slots.acquire(), timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            cls.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, try again")
+        finally:
+            cls.waiting -= 1
+
+        cls.active += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(cls.executor, func, *args)
+        finally:
+            cls.active -= 1
+            cls.slots.release()
+
+    @classmethod
+    def get_pool_stats(cls) -> dict:
+        return {
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "active": cls.active,
+            "waiting": cls.waiting,
+            "rejected": cls.rejected,
+        }
 
     @classmethod
     async def get_password_hash(cls, password: str) -> str:
-        return cls.pwd_context.hash(password)
+        return await cls.run_in_pool(cls.pwd_context.hash, password)
 
     @classmethod
     async def verify_password(cls, plain_password: str, hashed_password: str) -> bool:
-        return cls.pwd_context.verify(plain_password, hashed_password)
+        return await cls.run_in_pool(cls.pwd_context.verify, plain_password, hashed_password)
+
+    @classmethod
+    async def verify_and_update(cls, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await cls.run_in_pool(cls.pwd_context.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,39 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from applications.users.models import User
+from services.cache.cache import MemoryCacheBackend, ReadThroughCache
+from settings import settings
+
+
+class Principal:
+    __slots__ = ("id", "name", "email", "is_admin", "is_verified")
+
+    def __init__(self, id: int, name: str, email: str, is_admin: bool, is_verified: bool):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.is_admin = is_admin
+        self.is_verified = is_verified
+
+
+## in-process on purpose: principals are hit on every authenticated request and are not JSON, the short TTL
+## bounds how long another worker may serve a principal that was invalidated elsewhere
+principal_cache = ReadThroughCache(
+    MemoryCacheBackend(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+)
+
+
+async def get_principal_by_email(email: str, session: AsyncSession) -> Principal | None:
+    query = select(User.id, User.name, User.email, User.is_admin, User.is_verified).filter(User.email == email)
+    result = await session.execute(query)
+    row = result.one_or_none()
+    return Principal(*row) if row else None
+
+
+async def get_cached_principal(email: str, session: AsyncSession) -> Principal | None:
+    return await principal_cache.get_or_load(email, lambda: get_principal_by_email(email, session))
+
+
+async def invalidate_principal(*emails: str) -> None:
+    await principal_cache.invalidate(*emails)
@@ -0,0 +1,56 @@
+import time
+
+from fastapi import HTTPException, status
+
+from services.cache.cache import MemoryCacheBackend, RedisCacheBackend
+from settings import settings
+
+
+## Refresh tokens rotate on every use. A login starts a family and the store keeps the jti that is valid for
+## it right now; an older jti of the family coming back means the token leaked, so the whole family is revoked.
+## Entries live as long as a refresh token, which evicts revocations too. Several workers need
+## CACHE_BACKEND=redis to share it.
+class RefreshTokenStore:
+    def __init__(self):
+        ttl_seconds = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+        if settings.CACHE_BACKEND == "redis":
+            self.backend = RedisCacheBackend(settings.CACHE_REDIS_URL, ttl_seconds)
+        else:
+            self.backend = MemoryCacheBackend(settings.REFRESH_STORE_MAX_ENTRIES, ttl_seconds)
+
+    def family_key(self, family: str) -> str:
+        return f"refresh:family:{family}"
+
+    async def start_family(self, family: str, jti: str) -> None:
+        await self.backend.set(self.family_key(family), {"jti": jti, "previous": None, "rotated_at": time.time()})
+
+    async def rotate(self, family: str, jti: str, new_jti: str) -> None:
+        ## Compare-and-set, so of two requests carrying the same jti only one gets a new pair. The other one reads
+        ## the state again and lands in the reuse check below.
+        while True:
+            state = await self.backend.get(self.family_key(family))
+            if state is None or state.get("revoked"):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired")
+
+            if state["jti"] != jti:
+                ## a parallel request of the same browser may have rotated it a moment ago
+                if (
+                    jti == state["previous"]
+                    and time.time() - state["rotated_at"] < settings.REFRESH_REUSE_GRACE_SECONDS
+                ):
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Refresh token already rotated")
+                await self.revoke(family)
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reused")
+
+            rotated = {"jti": new_jti, "previous": jti, "rotated_at": time.time()}
+            if await self.backend.compare_and_set(self.family_key(family), state, rotated):
+                return
+
+    async def revoke(self, family: str) -> None:
+        await self.backend.set(self.family_key(family), {"revoked": True})
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+refresh_store = RefreshTokenStore()
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from applications.auth.auth_handler import auth_handler
-from applications.auth.security import get_current_user
-from applications.users.models import User
+from applications.auth.principal import Principal
+from applications.auth.password_handler import PasswordEncrypt
+from applications.auth.security import admin_required, get_current_user
 from applications.users.shemas import BaseUserInfo
 from database.session_dependencies import get_async_session
 
@@ -20,6 +21,32 @@ async def user_login(
     return token_pair
 
 
+## trades a refresh token for a new pair, the presented refresh token is dead afterwards
+@router_auth.post("/refresh")
+async def refresh_tokens(
+    refresh_token: str = Body(..., embed=True),
+    session: AsyncSession = Depends(get_async_session),
+):
+    token_pair = await auth_handler.refresh_token_pairs(refresh_token, session)
+    return token_pair
+
+
+@router_auth.post("/logout", status_code=204)
+async def user_logout(refresh_token: str = Body(..., embed=True)):
+    await auth_handler.revoke_refresh_token(refresh_token)
+
+
 @router_auth.get("/get_my_info")
-async def get_my_info(user: User = Depends(get_current_user)) -> BaseUserInfo:
+async def get_my_info(user: Principal = Depends(get_current_user)) -> BaseUserInfo:
     return user
+
+
+## public keys for verifying our tokens locally, empty while tokens are signed with a shared secret
+@router_auth.get("/jwks")
+async def get_jwks() -> dict:
+    return auth_handler.get_jwks()
+
+
+@router_auth.get("/password_pool_stats", dependencies=[Depends(admin_required)])
+async def get_password_pool_stats() -> dict:
+    return PasswordEncrypt.get_pool_stats()
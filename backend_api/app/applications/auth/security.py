@@ -3,27 +3,52 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from applications.auth.auth_handler import auth_handler
-from applications.users.crud import get_user_by_email
+from applications.auth.principal import Principal, get_cached_principal
 from applications.users.models import User
 from database.session_dependencies import get_async_session
 
 
 class SecurityHandler:
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+    optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 
 async def get_current_user(
     token: str = Depends(SecurityHandler.oauth2_scheme),
     session: AsyncSession = Depends(get_async_session),
-) -> User:
+) -> Principal:
     payload = await auth_handler.decode_token(token)
-    user = await get_user_by_email(payload["user_email"], session)
+    principal = await get_cached_principal(payload["user_email"], session)
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return principal
+
+
+## for public endpoints that show a bit more to a logged in user, a bad or expired token means anonymous
+async def get_optional_current_user(
+    token: str | None = Depends(SecurityHandler.optional_oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session),
+) -> Principal | None:
+    if not token:
+        return None
+    try:
+        return await get_current_user(token, session)
+    except HTTPException:
+        return None
+
+
+## for endpoints that change the user row itself
+async def get_current_user_model(
+    principal: Principal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    user = await session.get(User, principal.id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
 
-async def admin_required(user: User = Depends(get_current_user)) -> None:
+async def admin_required(user: Principal = Depends(get_current_user)) -> None:
 
     if not user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admin")
\ No newline at end of file
@@ -4,13 +4,20 @@ from fastapi import HTTPException
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from applications.auth.password_handler import PasswordEncrypt
+from applications.auth.principal import invalidate_principal
 from applications.users.models import User
+from services.cache.cache import cache
 
-async def create_user_in_db(email, name, password, session: AsyncSession) -> User:
+
+def author_cache_key(user_id: int) -> str:
+    return f"author:{user_id}"
+
+async def create_user_in_db(email, name, password, session: AsyncSession, user_uuid: uuid.UUID = None) -> User:
     hashed_password = await PasswordEncrypt.get_password_hash(password)
-    new_user = User(email=email,hashed_password=hashed_password,name=name)
+    new_user = User(email=email,hashed_password=hashed_password,name=name,uuid_data=user_uuid or uuid.uuid4())
     session.add(new_user)
     await session.commit()
     return new_user
@@ -32,8 +39,23 @@ async def activate_user_account(user_uuid, session: AsyncSession) -> None:
     user.is_verified = True
     session.add(user)
     await session.commit()
+    await invalidate_principal(user.email)
 
 async def get_project_by_pk(pk: int, session: AsyncSession) -> User | None:
-    query = select(User).filter(User.id == pk)
+    query = select(User).options(selectinload(User.projects)).filter(User.id == pk)
     result = await session.execute(query)
     return result.scalar_one_or_none()
+
+
+async def get_author_info(user_id: int, session: AsyncSession) -> dict | None:
+    query = select(
+        User.id, User.name, User.email, User.followers, User.profile_description, User.subscriptions, User.user_avatar,
+        User.user_avatar_variants,
+    ).filter(User.id == user_id)
+    result = await session.execute(query)
+    author = result.mappings().one_or_none()
+    return dict(author) if author else None
+
+
+async def invalidate_author_cache(user_id: int) -> None:
+    await cache.invalidate(author_cache_key(user_id))
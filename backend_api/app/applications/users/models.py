@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
 from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy import String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -25,6 +26,7 @@ class User(Base):
     is_verified: Mapped[bool] = mapped_column(default=False, nullable=True)
     profile_description: Mapped[str] = mapped_column(Text, nullable=True)
     user_avatar: Mapped[str] = mapped_column(nullable=True)
+    user_avatar_variants: Mapped[dict] = mapped_column(JSONB, default=dict, server_default="{}", nullable=False)
     followers: Mapped[int] = mapped_column(default=0)
     subscriptions: Mapped[int] = mapped_column(default=0)
 
@@ -34,7 +36,7 @@ class User(Base):
         "Project",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        lazy="raise"
     )
 
 
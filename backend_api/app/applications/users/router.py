@@ -1,17 +1,23 @@
 import uuid
 
-from fastapi import APIRouter, Depends, status, HTTPException, Request, BackgroundTasks, Header, Body, UploadFile, File, Form
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Header, Body, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from applications.users.crud import create_user_in_db, get_user_by_email, activate_user_account, get_project_by_pk
+from applications.users.crud import create_user_in_db, get_user_by_email, activate_user_account, get_project_by_pk, \
+    invalidate_author_cache
 from applications.users.shemas import BaseUserInfo, RegisterUserFields, NewComment, UserSchema, UserUpdateProfile
 from database.session_dependencies import get_async_session
+from database.query_counter import query_budget
 from services.rabbit.constants import SupportedQueues
-from services.rabbit.rabbitmq_service import rabbitmq_broker
+from services.outbox.models import add_outbox_event
+from services.outbox.relay import outbox_relay
 from applications.users.models import User
 from applications.auth.auth_handler import AuthHandler
-from applications.auth.security import get_current_user
+from applications.auth.principal import Principal, invalidate_principal
+from applications.auth.security import get_current_user, get_current_user_model
 from services.s3.s3 import s3_storage
+from services.s3.models import add_object_references, remove_object_references
+from services.images.variants import ImageVariants
 from typing import Optional
 
 router_users = APIRouter()
@@ -21,23 +27,25 @@ router_users = APIRouter()
 async def create_user(
         request: Request,
         new_user: RegisterUserFields,
-        background_task: BackgroundTasks,
         session: AsyncSession = Depends(get_async_session),
 ) -> BaseUserInfo:
     user = await get_user_by_email(new_user.email, session)
     if user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Already exists')
 
-    created_user = await create_user_in_db(new_user.email, new_user.name, new_user.password, session)
-    background_task.add_task(
-        rabbitmq_broker.send_message,
-        message={
-            "name": created_user.name,
-            "email": created_user.email,
-            'redirect_url': str(request.url_for('verify_user', user_uuid=created_user.uuid_data))
-        },
-        queue_name=SupportedQueues.USER_REGISTRATION
+    user_uuid = uuid.uuid4()
+    ## committed together with the user by create_user_in_db
+    add_outbox_event(
+        session,
+        queue_name=SupportedQueues.USER_REGISTRATION,
+        payload={
+            "name": new_user.name,
+            "email": new_user.email,
+            'redirect_url': str(request.url_for('verify_user', user_uuid=user_uuid))
+        }
     )
+    created_user = await create_user_in_db(new_user.email, new_user.name, new_user.password, session, user_uuid)
+    outbox_relay.wakeup()
 
     return created_user
 
@@ -49,7 +57,7 @@ async def verify_user(user_uuid: uuid.UUID, session: AsyncSession = Depends(get_
 
 
 @router_users.patch("/users/add_comment")
-async def add_comment_to_user(comment: dict = Body(...), user: User = Depends(get_current_user),
+async def add_comment_to_user(comment: dict = Body(...), user: User = Depends(get_current_user_model),
                               session: AsyncSession = Depends(get_async_session)):
     user.comments.append({
         "restaurant_id": comment["restaurant_id"],
@@ -61,15 +69,16 @@ async def add_comment_to_user(comment: dict = Body(...), user: User = Depends(ge
     return {"status": "ok", "comments": user.comments}
 
 
-@router_users.get("/me", response_model=UserSchema)
+@router_users.get("/me", response_model=UserSchema, dependencies=[Depends(query_budget(3))])
 async def get_my_info(
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_async_session),
 ):
-    return current_user
+    return await get_project_by_pk(current_user.id, session)
 
 
 
-@router_users.get("/{pk}", response_model=UserSchema)
+@router_users.get("/{pk}", response_model=UserSchema, dependencies=[Depends(query_budget(2))])
 async def get_user_by_pk(pk: int, session: AsyncSession = Depends(get_async_session)):
     user = await get_project_by_pk(pk, session)
     if not user:
@@ -83,11 +92,12 @@ async def upgrade_users_profile(
     name: str = Form(None),
     profile_description: str = Form(None),
     email: str = Form(None),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_model),
     session: AsyncSession = Depends(get_async_session),
     user_avatar: UploadFile = File(None)
 ):
     updated = False
+    previous_email = current_user.email
 
     if name is not None:
         if not name.strip():
@@ -105,9 +115,11 @@ async def upgrade_users_profile(
 
     if user_avatar is not None and user_avatar.filename:
         try:
-            user_uuid = str(uuid.uuid4())
-            avatar_url = await s3_storage.upload_user_avatar(user_avatar, user_uuid)
+            avatar_url = await s3_storage.upload_user_avatar(user_avatar)
+            await remove_object_references(session, [current_user.user_avatar])
+            await add_object_references(session, [avatar_url])
             current_user.user_avatar = avatar_url
+            current_user.user_avatar_variants = await ImageVariants.create_variants(user_avatar, avatar_url)
             updated = True
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -121,6 +133,8 @@ async def upgrade_users_profile(
     session.add(current_user)
     await session.commit()
     await session.refresh(current_user)
+    await invalidate_author_cache(current_user.id)
+    await invalidate_principal(previous_email, current_user.email)
 
     return {
         "status": "200",
@@ -128,6 +142,7 @@ async def upgrade_users_profile(
             "name": current_user.name,
             "description": current_user.profile_description,
             "email": current_user.email,
-            "user_avatar": current_user.user_avatar
+            "user_avatar": current_user.user_avatar,
+            "user_avatar_variants": current_user.user_avatar_variants,
         }
     }
\ No newline at end of file
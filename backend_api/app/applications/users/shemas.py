@@ -57,6 +57,7 @@ class UserSchema(BaseModel):
     profile_description: Optional[str] = None
     subscriptions: int
     user_avatar: Optional[str] = None
+    user_avatar_variants: dict[str, str] = {}
     projects: List[ProjectSchema]
 
 class UserUpdateProfile(BaseModel):
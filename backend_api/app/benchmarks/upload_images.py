@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from botocore.exceptions import ClientError
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+import services.s3.s3 as s3_module
+from services.s3.s3 import s3_storage
+
+
+def make_files(count: int, size: int) -> list[UploadFile]:
+    files = []
+    for number in range(count):
+        ## spooled like form uploads, random content so earlier runs are never found by the HEAD check
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        spool.write(os.urandom(size))
+        spool.seek(0)
+        files.append(UploadFile(
+            spool, size=size, filename=f"{number}.png", headers=Headers({"content-type": "image/png"})
+        ))
+    return files
+
+
+async def upload_one_by_one(files: list[UploadFile]) -> None:
+    for file in files:
+        await s3_storage.upload_files([file])
+
+
+async def upload_concurrently(files: list[UploadFile]) -> None:
+    await s3_storage.upload_product_images(files)
+
+
+async def skip_reservation(keys: list[str]) -> None:
+    pass
+
+
+async def run(count: int, size: int, measure_memory: bool) -> None:
+    ## only the S3 path is measured, stored_objects rows are not written
+    s3_module.reserve_objects = skip_reservation
+    s3_client = await s3_storage.get_client()
+    try:
+        await s3_client.create_bucket(
+            Bucket=s3_storage.bucket_name,
+            CreateBucketConfiguration={"LocationConstraint": s3_client.meta.region_name},
+        )
+    except ClientError as error:
+        if error.response['Error']['Code'] not in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
+            raise
+
+    try:
+        for label, upload in (("one by one", upload_one_by_one), ("upload_product_images", upload_concurrently)):
+            files = make_files(count, size)
+            if measure_memory:
+                tracemalloc.start()
+            started_at = time.perf_counter()
+            await upload(files)
+            seconds = time.perf_counter() - started_at
+            memory = ""
+            if measure_memory:
+                memory = f"  peak {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MiB"
+                tracemalloc.stop()
+            print(f"{label:<22} {seconds:7.2f} s  {count * size / 1024 / 1024 / seconds:7.1f} MiB/s{memory}")
+    finally:
+        await s3_storage.stop()
+
+
+## Uploads against settings.ENDPOINT, e.g. a local MinIO or `moto_server -p 9000` with ENDPOINT=http://localhost:9000:
+## cd backend_api/app && python -m benchmarks.upload_images --files 10 --size-kib 2048
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Project image uploads, sequential against concurrent")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-kib", type=int, default=2048)
+    parser.add_argument("--memory", action="store_true", help="report peak Python memory, slows the run down")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.files, args.size_kib * 1024, args.memory))
@@ -0,0 +1,72 @@
+import logging
+from contextvars import ContextVar
+
+from fastapi import Request
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from database.session_dependencies import engine
+from settings import settings
+
+
+class QueryStats:
+    __slots__ = ("count", "budget", "path")
+
+    def __init__(self, path: str = ""):
+        self.count = 0
+        self.budget: int | None = None
+        self.path = path
+
+    def exceeded(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    def describe(self) -> str:
+        return f"{self.path} ran {self.count} queries, budget is {self.budget}"
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+## In DEBUG the statement over the budget is not run, the handler fails before its transaction commits, so a
+## loader regression is noticed immediately and does not leave half a request in the database.
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    stats = query_stats.get()
+    if stats is None:
+        return
+    stats.count += 1
+    if settings.DEBUG and stats.exceeded():
+        raise QueryBudgetExceeded(stats.describe())
+
+
+## Declares how many SQL statements an endpoint may run:
+## @router.get('/{pk}', dependencies=[Depends(query_budget(2))])
+def query_budget(max_queries: int):
+    async def set_query_budget():
+        stats = query_stats.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    return set_query_budget
+
+
+## Counts statements per request, reports endpoints that run more than their query_budget and returns the count
+## in X-Query-Count. tests/test_query_budgets.py asserts the counts of the endpoints.
+class QueryCountMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        stats = QueryStats(f"{request.method} {request.url.path}")
+        token = query_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            query_stats.reset(token)
+
+        if stats.exceeded():
+            logging.error(stats.describe())
+
+        response.headers["X-Query-Count"] = str(stats.count)
+        return response
@@ -3,8 +3,10 @@ from logging.config import fileConfig
 from alembic import context
 from sqlalchemy import engine_from_config, pool
 
-from applications.Projects.models_restaurants import Project, ProjectComments, UserProject
+from applications.Projects.models_projects import Project, ProjectComments, ProjectLike, UserProject
 from applications.users.models import User
+from services.outbox.models import OutboxEvent
+from services.s3.models import StoredObject
 from database.base_models import Base
 from settings import settings
 
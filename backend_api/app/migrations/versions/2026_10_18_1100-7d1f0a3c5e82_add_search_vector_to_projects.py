@@ -0,0 +1,72 @@
+"""add search_vector to projects
+
+Revision ID: 7d1f0a3c5e82
+Revises: 4b7e2c91a0d3
+Create Date: 2026-10-18 11:00:41.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d1f0a3c5e82'
+down_revision: Union[str, None] = '4b7e2c91a0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+SEARCH_VECTOR_EXPRESSION = """
+    setweight(to_tsvector('simple', coalesce({row}project_name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}technologies, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}category, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}description, '')), 'C')
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('projects', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION projects_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_EXPRESSION.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER projects_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF project_name, technologies, category, description ON projects
+        FOR EACH ROW EXECUTE FUNCTION projects_search_vector_update()
+    """)
+
+    # backfill outside of the migration transaction so every batch commits and releases its row locks
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            result = connection.execute(sa.text(f"""
+                UPDATE projects SET search_vector = {SEARCH_VECTOR_EXPRESSION.format(row='')}
+                WHERE id IN (
+                    SELECT id FROM projects WHERE search_vector IS NULL ORDER BY id LIMIT :batch_size
+                )
+            """), {"batch_size": BACKFILL_BATCH_SIZE})
+            if result.rowcount < BACKFILL_BATCH_SIZE:
+                break
+
+        op.create_index(
+            'ix_projects_search_vector', 'projects', ['search_vector'],
+            unique=False, postgresql_using='gin', postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_projects_search_vector', table_name='projects', postgresql_using='gin')
+    op.execute("DROP TRIGGER IF EXISTS projects_search_vector_trigger ON projects")
+    op.execute("DROP FUNCTION IF EXISTS projects_search_vector_update()")
+    op.drop_column('projects', 'search_vector')
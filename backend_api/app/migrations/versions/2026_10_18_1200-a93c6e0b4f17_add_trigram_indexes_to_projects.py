@@ -0,0 +1,36 @@
+"""add trigram indexes to projects
+
+Revision ID: a93c6e0b4f17
+Revises: 7d1f0a3c5e82
+Create Date: 2026-10-18 12:00:07.553981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93c6e0b4f17'
+down_revision: Union[str, None] = '7d1f0a3c5e82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_projects_project_name_trgm', 'projects', ['project_name'],
+        unique=False, postgresql_using='gin', postgresql_ops={'project_name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_projects_category_trgm', 'projects', ['category'],
+        unique=False, postgresql_using='gin', postgresql_ops={'category': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_projects_category_trgm', table_name='projects', postgresql_using='gin')
+    op.drop_index('ix_projects_project_name_trgm', table_name='projects', postgresql_using='gin')
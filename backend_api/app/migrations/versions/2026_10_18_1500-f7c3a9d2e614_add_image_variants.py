@@ -0,0 +1,33 @@
+"""add image variants
+
+Revision ID: f7c3a9d2e614
+Revises: e4a1b7c3d925
+Create Date: 2026-10-18 15:00:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c3a9d2e614'
+down_revision: Union[str, None] = 'e4a1b7c3d925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('projects', sa.Column('image_variants', postgresql.JSONB(astext_type=sa.Text()),
+                                        server_default='{}', nullable=False))
+    op.add_column('users', sa.Column('user_avatar_variants', postgresql.JSONB(astext_type=sa.Text()),
+                                     server_default='{}', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'user_avatar_variants')
+    op.drop_column('projects', 'image_variants')
@@ -0,0 +1,38 @@
+"""add table stored objects
+
+Revision ID: 0b5d8e2f7a41
+Revises: f7c3a9d2e614
+Create Date: 2026-10-18 16:00:37.905126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b5d8e2f7a41'
+down_revision: Union[str, None] = 'f7c3a9d2e614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stored_objects',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_stored_objects_unreferenced', 'stored_objects', ['updated_at'], unique=False,
+                    postgresql_where=sa.text('ref_count = 0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stored_objects_unreferenced', table_name='stored_objects',
+                  postgresql_where=sa.text('ref_count = 0'))
+    op.drop_table('stored_objects')
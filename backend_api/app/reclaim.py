@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select
+
+from database.session_dependencies import async_session_maker
+from services.s3.models import StoredObject
+from services.s3.s3 import s3_storage
+from settings import settings
+
+
+## python reclaim.py --limit 500
+## deletes objects nobody referenced for S3_RECLAIM_GRACE_SECONDS together with their image variants
+async def reclaim(limit: int | None, dry_run: bool) -> int:
+    reclaimed = 0
+    try:
+        async with async_session_maker() as session:
+            while limit is None or reclaimed < limit:
+                batch_size = 100 if limit is None else min(100, limit - reclaimed)
+                ## rows stay locked until the commit. Uploads reserve their key before the HEAD that may skip the PUT,
+                ## so the reservation waits for this delete and uploads again, or it comes first, refreshes updated_at
+                ## and the key is not selected here.
+                result = await session.execute(
+                    select(StoredObject.key)
+                    .where(
+                        StoredObject.ref_count == 0,
+                        StoredObject.updated_at < func.now() - timedelta(seconds=settings.S3_RECLAIM_GRACE_SECONDS),
+                    )
+                    .order_by(StoredObject.updated_at)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                keys = result.scalars().all()
+                if not keys:
+                    break
+
+                if dry_run:
+                    logging.warning("Would delete %s", ", ".join(keys))
+                    reclaimed += len(keys)
+                    break
+
+                for key in keys:
+                    await s3_storage.delete_with_variants(key)
+                await session.execute(
+                    delete(StoredObject).where(StoredObject.key.in_(keys), StoredObject.ref_count == 0)
+                )
+                await session.commit()
+                reclaimed += len(keys)
+    finally:
+        await s3_storage.stop()
+    return reclaimed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete stored objects that are no longer referenced")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    count = asyncio.run(reclaim(args.limit, args.dry_run))
+    logging.warning("Reclaimed %s objects", count)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from redis import asyncio as redis_asyncio
+from redis.exceptions import WatchError
+
+from settings import settings
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: int | None = None) -> None:
+        self.entries[key] = (time.monotonic() + (ttl_seconds or self.ttl_seconds), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    ## nothing awaits between the read and the write, so no other coroutine can change the entry in between
+    async def compare_and_set(self, key: str, expected: Any, value: Any, ttl_seconds: int | None = None) -> bool:
+        if await self.get(key) != expected:
+            return False
+        await self.set(key, value, ttl_seconds)
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def close(self) -> None:
+        self.entries.clear()
+
+
+## Works with any server speaking the Redis protocol (Redis, Valkey, KeyDB, a local stand-in for tests).
+## Values have to be JSON serializable.
+class RedisCacheBackend:
+    def __init__(self, url: str, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Any | None:
+        raw_value = await self.client.get(key)
+        if raw_value is None:
+            return None
+        return json.loads(raw_value)
+
+    async def set(self, key: str, value: Any, ttl_seconds: int | None = None) -> None:
+        await self.client.set(key, json.dumps(value), ex=ttl_seconds or self.ttl_seconds)
+
+    ## WATCH makes the write fail when another client changed the key after it was read
+    async def compare_and_set(self, key: str, expected: Any, value: Any, ttl_seconds: int | None = None) -> bool:
+        async with self.client.pipeline() as pipe:
+            await pipe.watch(key)
+            raw_value = await pipe.get(key)
+            if (None if raw_value is None else json.loads(raw_value)) != expected:
+                return False
+            pipe.multi()
+            pipe.set(key, json.dumps(value), ex=ttl_seconds or self.ttl_seconds)
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class ReadThroughCache:
+    def __init__(self, backend: MemoryCacheBackend | RedisCacheBackend):
+        self.backend = backend
+        self._loading: dict[str, asyncio.Future] = {}
+        self._generations: dict[str, int] = {}
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any | None:
+        value = await self.backend.get(key)
+        if value is not None:
+            return value
+
+        ## concurrent misses on the same key wait for the first loader instead of running the query again
+        loading = self._loading.get(key)
+        if loading is not None:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+                ## the first loader was cancelled with its request, this caller still wants the value
+                return await self.get_or_load(key, loader)
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[key] = loading
+        generation = self._generations.get(key, 0)
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except BaseException as error:
+            loading.set_exception(error)
+            loading.exception()
+            raise
+        finally:
+            if self._loading.get(key) is loading:
+                del self._loading[key]
+
+        loading.set_result(value)
+        ## an invalidation while loading means the loaded value may already be stale, so do not store it
+        if value is not None and self._generations.get(key, 0) == generation:
+            await self.backend.set(key, value)
+        return value
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._loading.pop(key, None)
+        await self.backend.delete(*keys)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def get_cache_backend() -> MemoryCacheBackend | RedisCacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_REDIS_URL, settings.CACHE_TTL_SECONDS)
+    return MemoryCacheBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+
+
+cache = ReadThroughCache(get_cache_backend())
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from sqlalchemy import Integer, Table, column, func, update, values
+
+from applications.Projects.models_projects import Project
+from database.session_dependencies import async_session_maker
+from settings import settings
+
+
+## Collects counter deltas in memory and writes them with one UPDATE ... FROM (VALUES ...) every
+## flush_interval_ms or flush_max_events, so a hot row is locked once per flush instead of once per request
+class CounterBuffer:
+    def __init__(self, table: Table, counter_column: str, flush_interval_ms: int, flush_max_events: int):
+        self.table = table
+        self.counter_column = counter_column
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_events = flush_max_events
+
+        self.pending: dict[int, int] = defaultdict(int)
+        self.in_flight: dict[int, int] = {}
+        self.events = 0
+        self.flush_listeners: list[Callable[[list[int]], Awaitable[None]]] = []
+
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def add(self, pk: int, delta: int) -> None:
+        self.pending[pk] += delta
+        self.events += 1
+        if self.events >= self.flush_max_events:
+            self._wakeup.set()
+
+    def get_pending(self, pk: int) -> int:
+        return self.pending.get(pk, 0) + self.in_flight.get(pk, 0)
+
+    def add_flush_listener(self, listener: Callable[[list[int]], Awaitable[None]]) -> None:
+        self.flush_listeners.append(listener)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            batch = {pk: delta for pk, delta in self.pending.items() if delta}
+            self.pending = defaultdict(int)
+            self.events = 0
+            if not batch:
+                return
+
+            self.in_flight = batch
+            deltas = values(column("id", Integer), column("delta", Integer), name="deltas").data(list(batch.items()))
+            counter = self.table.c[self.counter_column]
+            query = (
+                update(self.table)
+                .where(self.table.c.id == deltas.c.id)
+                .values({counter: func.greatest(func.coalesce(counter, 0) + deltas.c.delta, 0)})
+            )
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(query)
+                    await session.commit()
+            except BaseException:
+                ## keep the deltas for the next flush instead of losing them
+                for pk, delta in batch.items():
+                    self.pending[pk] += delta
+                raise
+            finally:
+                self.in_flight = {}
+
+        for listener in self.flush_listeners:
+            await listener(list(batch))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Failed to flush %s.%s counters", self.table.name, self.counter_column)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        ## the loop is woken up and left to finish its flush, cancelling it mid write would lose the batch
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+likes_counter = CounterBuffer(
+    Project.__table__,
+    "count_of_likes",
+    flush_interval_ms=settings.COUNTER_FLUSH_INTERVAL_MS,
+    flush_max_events=settings.COUNTER_FLUSH_MAX_EVENTS,
+)
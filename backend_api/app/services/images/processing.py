@@ -0,0 +1,22 @@
+import io
+
+from PIL import Image, ImageOps
+
+## Runs inside the image worker processes, keep this module free of app imports so workers start cheap.
+
+
+def render_variants(data: bytes, sizes: dict[str, int], formats: list[str], quality: int) -> dict[str, bytes]:
+    variants = {}
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+
+        for name, size in sizes.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            for image_format in formats:
+                buffer = io.BytesIO()
+                resized.save(buffer, format=image_format.upper(), quality=quality)
+                variants[f"{name}.{image_format}"] = buffer.getvalue()
+    return variants
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import UploadFile
+from PIL import features
+
+from services.images.processing import render_variants
+from services.s3.s3 import s3_storage
+from settings import settings
+
+
+## Resizing and encoding is CPU bound and holds the GIL, so it runs in worker processes. Variants are stored
+## under variants/<original key>/<size>.<format>, the same original always maps to the same keys, so variants of
+## an image that was stored before are found with a HEAD and not rendered again.
+class ImageVariants:
+    executor = ProcessPoolExecutor(
+        max_workers=settings.IMAGE_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+    )
+    formats = [image_format for image_format in settings.IMAGE_VARIANT_FORMATS if features.check(image_format)]
+
+    @classmethod
+    async def create_variants(cls, file: UploadFile, source_url: str) -> dict[str, str]:
+        if not (file.content_type or "").startswith("image/") or (file.size or 0) > settings.IMAGE_VARIANT_MAX_BYTES:
+            return {}
+
+        source_key = s3_storage.get_key(source_url)
+        names = [f"{name}.{image_format}" for name in settings.IMAGE_VARIANT_SIZES for image_format in cls.formats]
+        if not names:
+            return {}
+        ## a failed HEAD counts as missing, the variants are rendered and uploaded again
+        exists = await asyncio.gather(
+            *[s3_storage.object_exists(f"variants/{source_key}/{name}") for name in names], return_exceptions=True
+        )
+        if all(result is True for result in exists):
+            return {name: s3_storage.get_url(f"variants/{source_key}/{name}") for name in names}
+
+        await file.seek(0)
+        data = await file.read()
+        loop = asyncio.get_running_loop()
+        try:
+            variants = await loop.run_in_executor(
+                cls.executor,
+                render_variants,
+                data,
+                settings.IMAGE_VARIANT_SIZES,
+                cls.formats,
+                settings.IMAGE_VARIANT_QUALITY,
+            )
+        except Exception:
+            ## variants only make pages lighter, the original upload is still usable
+            logging.exception("Could not render variants for %s", source_url)
+            return {}
+
+        ## the same goes for storing them, a variant that failed to upload is left out and pages use the original
+        urls = await asyncio.gather(*[
+            s3_storage.upload_bytes(f"variants/{source_key}/{name}", content, f"image/{name.rsplit('.', 1)[1]}")
+            for name, content in variants.items()
+        ], return_exceptions=True)
+        uploaded = {}
+        for name, url in zip(variants, urls):
+            if isinstance(url, Exception):
+                logging.error("Could not upload variant %s of %s", name, source_url, exc_info=url)
+            elif isinstance(url, BaseException):
+                raise url
+            else:
+                uploaded[name] = url
+        return uploaded
+
+    @classmethod
+    async def create_variants_for_files(cls, files: list[UploadFile], source_urls: list[str]) -> dict[str, dict]:
+        results = await asyncio.gather(*[
+            cls.create_variants(file, source_url) for file, source_url in zip(files, source_urls)
+        ])
+        return {source_url: variants for source_url, variants in zip(source_urls, results) if variants}
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import Index, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from database.base_models import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_unsent", "id", postgresql_where=text("sent_at IS NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    queue_name: Mapped[str] = mapped_column(String(150))
+    payload: Mapped[dict] = mapped_column(JSONB)
+    sent_at: Mapped[datetime] = mapped_column(nullable=True)
+
+
+## the event is written by the same commit as the domain change, the relay publishes it afterwards
+def add_outbox_event(session: AsyncSession, queue_name: str, payload: dict) -> None:
+    session.add(OutboxEvent(queue_name=queue_name, payload=payload))
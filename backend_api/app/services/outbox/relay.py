@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import delete, func, select, update
+
+from database.session_dependencies import async_session_maker
+from services.outbox.models import OutboxEvent
+from services.rabbit.rabbitmq_service import rabbitmq_publisher
+from settings import settings
+
+
+## Drains the outbox table in batches. SKIP LOCKED lets several API workers run a relay at the same time
+## without publishing the same rows twice.
+class OutboxRelay:
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._last_purge = 0.0
+
+    def wakeup(self) -> None:
+        self._wakeup.set()
+
+    async def relay_batch(self) -> int:
+        async with async_session_maker() as session:
+            query = (
+                select(OutboxEvent.id, OutboxEvent.queue_name, OutboxEvent.payload)
+                .where(OutboxEvent.sent_at.is_(None))
+                .order_by(OutboxEvent.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            events = (await session.execute(query)).all()
+            if not events:
+                return 0
+
+            await rabbitmq_publisher.publish_batch([(event.queue_name, event.payload) for event in events])
+            await session.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_([event.id for event in events]))
+                .values(sent_at=func.now())
+            )
+            await session.commit()
+            return len(events)
+
+    async def purge_sent(self) -> None:
+        async with async_session_maker() as session:
+            await session.execute(
+                delete(OutboxEvent).where(
+                    OutboxEvent.sent_at < func.now() - func.make_interval(0, 0, 0, 0, settings.OUTBOX_RETENTION_HOURS)
+                )
+            )
+            await session.commit()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sent = await self.relay_batch()
+                if time.monotonic() - self._last_purge > settings.OUTBOX_PURGE_INTERVAL_SECONDS:
+                    await self.purge_sent()
+                    self._last_purge = time.monotonic()
+            except Exception:
+                logging.exception("Failed to relay outbox events")
+                sent = 0
+
+            if sent < settings.OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+outbox_relay = OutboxRelay()
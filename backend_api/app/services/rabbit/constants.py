@@ -5,3 +5,6 @@ from enum import StrEnum
 class SupportedQueues(StrEnum):
     USER_REGISTRATION = 'user_registration'
     USER_ADDED_PRODUCT_TO_CART = 'user_added_product_to_cart'
+    PROJECT_COMMENTED = 'project_commented'
+    PROJECT_LIKED = 'project_liked'
+    USER_FOLLOWED = 'user_followed'
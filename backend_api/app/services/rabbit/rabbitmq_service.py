@@ -1,53 +1,143 @@
-import pika
+import asyncio
+import json
+import logging
 import ssl
 
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from fastapi import HTTPException, status
+
 from settings import settings
-import json
 
 
-class RabbitMQBroker:
+## One robust connection for the whole worker, started in the app lifespan. Messages go through a bounded
+## buffer, are grouped into small batches and published on a pool of channels with publisher confirms.
+class RabbitMQPublisher:
     def __init__(self):
-        ssl_context = ssl.create_default_context()
+        self.connection: AbstractRobustConnection | None = None
+        self.channels: asyncio.Queue[AbstractChannel] = asyncio.Queue()
+        self.buffer: asyncio.Queue[tuple[str, dict]] = asyncio.Queue(maxsize=settings.RMQ_PUBLISH_BUFFER_SIZE)
+        self.declared_queues: set[str] = set()
+        self._workers: list[asyncio.Task] = []
+        self._connecting: asyncio.Task | None = None
 
-        self.connection_params = pika.ConnectionParameters(
+    async def connect(self) -> None:
+        connection = await aio_pika.connect_robust(
             host=settings.RMQ_HOST,
             port=settings.RMQ_PORT,
-            virtual_host=settings.RMQ_VIRTUAL_HOST,
-            credentials=pika.PlainCredentials(username=settings.RMQ_USER, password=settings.RMQ_PASSWORD),
-            ssl_options=pika.SSLOptions(context=ssl_context)
+            virtualhost=settings.RMQ_VIRTUAL_HOST,
+            login=settings.RMQ_USER,
+            password=settings.RMQ_PASSWORD,
+            ssl=True,
+            ssl_context=ssl.create_default_context(),
         )
+        try:
+            channels = [
+                await connection.channel(publisher_confirms=True) for _ in range(settings.RMQ_CHANNEL_POOL_SIZE)
+            ]
+        except BaseException:
+            await connection.close()
+            raise
+        for channel in channels:
+            self.channels.put_nowait(channel)
+        self.connection = connection
+
+    async def _keep_connecting(self) -> None:
+        delay = 1.0
+        while self.connection is None:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.RMQ_RECONNECT_MAX_DELAY)
+            try:
+                await self.connect()
+            except Exception:
+                logging.exception("Failed to connect to RabbitMQ, next attempt in %s seconds", delay)
+
+    async def start(self) -> None:
+        for _ in range(settings.RMQ_CHANNEL_POOL_SIZE):
+            self._workers.append(asyncio.create_task(self._run()))
+        ## The robust connection only reconnects after it connected once, so the first connect is retried here.
+        ## The API starts without the broker, events stay in the outbox until the relay can publish them.
+        try:
+            await self.connect()
+        except Exception:
+            logging.exception("RabbitMQ is unavailable, publishing is paused until it connects")
+            self._connecting = asyncio.create_task(self._keep_connecting())
+
+    async def stop(self) -> None:
+        if self._connecting is not None:
+            self._connecting.cancel()
+            await asyncio.gather(self._connecting, return_exceptions=True)
+            self._connecting = None
+
+        try:
+            await asyncio.wait_for(self.buffer.join(), timeout=settings.RMQ_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.error("RabbitMQ publisher stopped with %s unpublished messages", self.buffer.qsize())
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+    async def send_message(self, message: dict, queue_name: str) -> None:
+        ## a full buffer means the broker does not keep up, slow the callers down and finally reject them
+        try:
+            await asyncio.wait_for(self.buffer.put((queue_name, message)), timeout=settings.RMQ_PUBLISH_BUFFER_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Message broker is busy")
+
+    async def publish_batch(self, messages: list[tuple[str, dict]]) -> None:
+        if self.connection is None:
+            raise ConnectionError("RabbitMQ is not connected")
+        channel = await self.channels.get()
+        try:
+            await asyncio.gather(*(self._publish(channel, queue_name, message) for queue_name, message in messages))
+        finally:
+            self.channels.put_nowait(channel)
+
+    async def _publish(self, channel: AbstractChannel, queue_name: str, message: dict) -> None:
+        if queue_name not in self.declared_queues:
+            await channel.declare_queue(queue_name, durable=True)
+            self.declared_queues.add(queue_name)
+
+        ## with publisher confirms the call returns once the broker acknowledged the message
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=json.dumps(message).encode(),
+                content_type="application/json",
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=queue_name,
+        )
+
+    async def _collect_batch(self) -> list[tuple[str, dict]]:
+        batch = [await self.buffer.get()]
+        if settings.RMQ_PUBLISH_BATCH_WINDOW_MS:
+            await asyncio.sleep(settings.RMQ_PUBLISH_BATCH_WINDOW_MS / 1000)
+        while len(batch) < settings.RMQ_PUBLISH_BATCH_SIZE and not self.buffer.empty():
+            batch.append(self.buffer.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            try:
+                for attempt in range(settings.RMQ_PUBLISH_RETRIES):
+                    try:
+                        await self.publish_batch(batch)
+                        break
+                    except Exception:
+                        logging.exception("Failed to publish %s messages, attempt %s", len(batch), attempt + 1)
+                        await asyncio.sleep(2 ** attempt)
+                else:
+                    logging.error("Dropped %s messages after %s attempts", len(batch), settings.RMQ_PUBLISH_RETRIES)
+            finally:
+                for _ in batch:
+                    self.buffer.task_done()
+
 
-    def get_connection(self) -> pika.BlockingConnection:
-        return pika.BlockingConnection(parameters=self.connection_params)
-
-    def send_message(self, message: dict, queue_name: str):
-        with self.get_connection() as connection:
-            with connection.channel() as channel:
-                channel.queue_declare(queue=queue_name, durable=True)
-
-                message_json_str = json.dumps(message)
-
-                channel.basic_publish(
-                    exchange='',
-                    routing_key=queue_name,
-                    body=message_json_str.encode()
-                )
-
-    # async def get_connection(self) -> pika.BlockingConnection:
-    #     return pika.BlockingConnection(parameters=self.connection_params)
-    #
-    # async def send_message(self, message: dict, queue_name: str):
-    #     with await self.get_connection() as connection:
-    #         with connection.channel() as channel:
-    #             channel.queue_declare(queue=queue_name)
-    #
-    #             message_json_str = json.dumps(message)
-    #
-    #             channel.basic_publish(
-    #                 exchange='',
-    #                 routing_key=queue_name,
-    #                 body=message_json_str.encode()
-    #             )
-
-
-rabbitmq_broker = RabbitMQBroker()
\ No newline at end of file
+rabbitmq_publisher = RabbitMQPublisher()
@@ -0,0 +1,67 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import Index, String, func, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database.base_models import Base
+from database.session_dependencies import async_session_maker
+from settings import settings
+
+CONTENT_ADDRESSED_PREFIX = "sha256/"
+
+
+## One row per content-addressed object, ref_count is how many columns point at it. Objects at zero for longer
+## than S3_RECLAIM_GRACE_SECONDS are deleted by reclaim.py.
+class StoredObject(Base):
+    __tablename__ = "stored_objects"
+    __table_args__ = (
+        Index("ix_stored_objects_unreferenced", "updated_at", postgresql_where=text("ref_count = 0")),
+    )
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    ref_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
+
+
+def count_keys(urls: list[str | None]) -> Counter:
+    keys = (url.removeprefix(f"{settings.PUBLIC_URL}/") for url in urls if url)
+    return Counter(key for key in keys if key.startswith(CONTENT_ADDRESSED_PREFIX))
+
+
+async def upsert_objects(session: AsyncSession, refs: dict[str, int]) -> None:
+    stmt = insert(StoredObject).values([{"key": key, "ref_count": count} for key, count in refs.items()])
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[StoredObject.key],
+            set_={"ref_count": StoredObject.ref_count + stmt.excluded.ref_count, "updated_at": func.now()},
+        )
+    )
+
+
+## runs inside the caller's transaction, so the references are committed together with the rows holding the urls
+async def add_object_references(session: AsyncSession, urls: list[str | None]) -> None:
+    keys = count_keys(urls)
+    if keys:
+        await upsert_objects(session, keys)
+
+
+## Committed before the HEAD that decides whether a key is uploaded, in a transaction of its own. reclaim.py holds
+## the row lock while it deletes, so an upload either waits and finds the object gone, or refreshes updated_at first
+## and takes the key out of the grace period. Uploads that never get referenced stay here at zero references.
+async def reserve_objects(keys: list[str]) -> None:
+    async with async_session_maker() as session:
+        await upsert_objects(session, dict.fromkeys(keys, 0))
+        await session.commit()
+
+
+async def remove_object_references(session: AsyncSession, urls: list[str | None]) -> None:
+    for key, refs in count_keys(urls).items():
+        await session.execute(
+            update(StoredObject)
+            .where(StoredObject.key == key)
+            .values(ref_count=func.greatest(StoredObject.ref_count - refs, 0), updated_at=func.now())
+        )
@@ -1,37 +1,242 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import AsyncExitStack
+
 import aioboto3
+from aiobotocore.config import AioConfig
+from botocore.exceptions import ClientError
 from fastapi import UploadFile
 
+from services.s3.models import CONTENT_ADDRESSED_PREFIX, reserve_objects
 from settings import settings
 
 
+class UploadProgress:
+    __slots__ = ("key", "total_bytes", "uploaded_bytes", "started_at")
+
+    def __init__(self, key: str, total_bytes: int | None):
+        self.key = key
+        self.total_bytes = total_bytes
+        self.uploaded_bytes = 0
+        self.started_at = time.monotonic()
+
+    def as_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "total_bytes": self.total_bytes,
+            "uploaded_bytes": self.uploaded_bytes,
+            "seconds": round(time.monotonic() - self.started_at, 2),
+        }
+
+
+## One client for the whole process, opened in the lifespan: credentials are resolved once and PUTs reuse
+## pooled keep-alive connections instead of a TLS handshake per upload.
 class S3Storage:
     def __init__(self):
         self.bucket_name = settings.BUCKET_NAME
+        self.session = aioboto3.Session()
+        self.client = None
+        self.exit_stack: AsyncExitStack | None = None
+        self.start_lock = asyncio.Lock()
+        self.uploads: dict[str, UploadProgress] = {}
+
+    def get_client_config(self) -> AioConfig:
+        return AioConfig(
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.S3_CONNECT_TIMEOUT,
+            read_timeout=settings.S3_READ_TIMEOUT,
+            retries={'max_attempts': settings.S3_MAX_RETRIES, 'mode': 'standard'},
+            tcp_keepalive=True,
+            connector_args={'keepalive_timeout': settings.S3_KEEPALIVE_TIMEOUT},
+        )
+
+    async def start(self) -> None:
+        async with self.start_lock:
+            if self.client is not None:
+                return
+            exit_stack = AsyncExitStack()
+            self.client = await exit_stack.enter_async_context(
+                self.session.client(
+                    's3',
+                    endpoint_url=settings.ENDPOINT,
+                    aws_access_key_id=settings.ACCESS_KEY,
+                    aws_secret_access_key=settings.SECRET_KEY,
+                    region_name='EEUR',
+                    config=self.get_client_config(),
+                )
+            )
+            self.exit_stack = exit_stack
+
+    async def stop(self) -> None:
+        if self.exit_stack is not None:
+            await self.exit_stack.aclose()
+        self.exit_stack = None
+        self.client = None
+
+    async def get_client(self):
+        if self.client is None:
+            await self.start()
+        return self.client
+
+    def get_url(self, key: str) -> str:
+        return f"{settings.PUBLIC_URL}/{key}"
+
+    def get_key(self, url: str) -> str:
+        return url.removeprefix(f"{settings.PUBLIC_URL}/")
+
+    async def upload_bytes(self, key: str, data: bytes, content_type: str) -> str:
+        s3_client = await self.get_client()
+        await s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=data, ContentType=content_type)
+        return self.get_url(key)
+
+    async def object_exists(self, key: str) -> bool:
+        s3_client = await self.get_client()
+        try:
+            await s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    async def hash_file(self, file: UploadFile) -> str:
+        ## the key is the sha256 of the content, so a file that is already stored costs a HEAD instead of a PUT
+        digest = hashlib.sha256()
+        await file.seek(0)
+        while chunk := await file.read(settings.S3_MULTIPART_PART_SIZE):
+            await asyncio.to_thread(digest.update, chunk)
+        return f"{CONTENT_ADDRESSED_PREFIX}{digest.hexdigest()}"
+
+    async def store_file(self, file: UploadFile, key: str) -> None:
+        if await self.object_exists(key):
+            return
+
+        ## Small files go up as one PUT streamed from the spool, the HTTP client reads the body in chunks. Anything
+        ## reaching the threshold, or of unknown size, goes up as a parallel multipart upload, so no upload holds more
+        ## than S3_MULTIPART_CONCURRENCY parts in memory.
+        await file.seek(0)
+        if file.size is not None and file.size < settings.S3_MULTIPART_THRESHOLD:
+            s3_client = await self.get_client()
+            await s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=file.file,
+                ContentLength=file.size,
+                ContentType=file.content_type or 'binary/octet-stream',
+            )
+            return
+
+        await self.multipart_upload(file, key)
+
+    async def upload_files(self, files: list[UploadFile]) -> list[str]:
+        ## files are read from their UploadFile spool part by part and never buffered as a whole
+        upload_slots = asyncio.Semaphore(settings.S3_UPLOAD_CONCURRENCY)
+
+        async def hash_file(file: UploadFile) -> str:
+            async with upload_slots:
+                return await self.hash_file(file)
+
+        async def store_file(file: UploadFile, key: str) -> None:
+            async with upload_slots:
+                await self.store_file(file, key)
+
+        keys = await asyncio.gather(*[hash_file(file) for file in files])
+        unique_files = dict(zip(keys, files))
+        ## every key has a row before anything is uploaded, a failed batch is left for reclaim.py
+        await reserve_objects(list(unique_files))
+        results = await asyncio.gather(
+            *[store_file(file, key) for key, file in unique_files.items()], return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        return [self.get_url(key) for key in keys]
+
+    async def multipart_upload(self, file: UploadFile, key: str) -> None:
+        s3_client = await self.get_client()
+        upload = await s3_client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=key, ContentType=file.content_type or 'binary/octet-stream'
+        )
+        upload_id = upload['UploadId']
+        progress = self.uploads[upload_id] = UploadProgress(key, file.size)
+        ## a slot is taken before a part is read, so at most S3_MULTIPART_CONCURRENCY parts sit in memory
+        part_slots = asyncio.Semaphore(settings.S3_MULTIPART_CONCURRENCY)
+        tasks: list[asyncio.Task] = []
+
+        async def upload_part(part_number: int, chunk: bytes) -> dict:
+            try:
+                response = await s3_client.upload_part(
+                    Bucket=self.bucket_name, Key=key, UploadId=upload_id, PartNumber=part_number, Body=chunk
+                )
+            finally:
+                part_slots.release()
+            progress.uploaded_bytes += len(chunk)
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+        try:
+            while True:
+                await part_slots.acquire()
+                failed = next((task for task in tasks if task.done() and task.exception()), None)
+                if failed is not None:
+                    part_slots.release()
+                    raise failed.exception()
+
+                chunk = await file.read(settings.S3_MULTIPART_PART_SIZE)
+                if not chunk:
+                    part_slots.release()
+                    break
+                tasks.append(asyncio.create_task(upload_part(len(tasks) + 1, chunk)))
+
+            parts = await asyncio.gather(*tasks)
+            await s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            except Exception:
+                logging.exception("Could not abort multipart upload of %s", key)
+            raise
+        finally:
+            del self.uploads[upload_id]
+
+        seconds = time.monotonic() - progress.started_at
+        logging.info(
+            "Uploaded %s in %s parts, %.1f MiB/s",
+            key, len(tasks), progress.uploaded_bytes / 1024 / 1024 / max(seconds, 0.001)
+        )
+
+    def get_active_uploads(self) -> list[dict]:
+        return [progress.as_dict() for progress in self.uploads.values()]
+
+    async def upload_product_images(self, files: list[UploadFile]) -> list[str]:
+        return await self.upload_files(files)
+
+    async def delete_objects(self, keys: list[str]) -> None:
+        ## delete_objects takes at most 1000 keys per request
+        s3_client = await self.get_client()
+        for start in range(0, len(keys), 1000):
+            await s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True}
+            )
+
+    async def delete_with_variants(self, key: str) -> None:
+        s3_client = await self.get_client()
+        keys = [key]
+        paginator = s3_client.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"variants/{key}/"):
+            keys.extend(item['Key'] for item in page.get('Contents', []))
+        await self.delete_objects(keys)
 
-    async def get_s3_session(self):
-        session = aioboto3.Session()
-        async with session.client(
-                's3',
-                endpoint_url=settings.ENDPOINT,
-                aws_access_key_id=settings.ACCESS_KEY,
-                aws_secret_access_key=settings.SECRET_KEY,
-                region_name='EEUR'
-        ) as s3:
-            yield s3
-
-    async def upload_product_image(self, file: UploadFile, restaurant_uuid: str) -> str:
-        async for s3_client in self.get_s3_session():
-            path = f'restaurant/{restaurant_uuid}/{file.filename}'
-            await s3_client.upload_fileobj(file, self.bucket_name, path)
-            url = f"{settings.PUBLIC_URL}/{path}"
-        return url
-
-    async def upload_user_avatar(self, file: UploadFile, user_uuid: str) -> str:
-        async for s3_client in self.get_s3_session():
-            path = f'user/{user_uuid}/{file.filename}'
-            await s3_client.upload_fileobj(file, self.bucket_name, path)
-            url = f"{settings.PUBLIC_URL}/{path}"
-        return url
+    async def upload_user_avatar(self, file: UploadFile) -> str:
+        urls = await self.upload_files([file])
+        return urls[0]
 
 
 s3_storage = S3Storage()
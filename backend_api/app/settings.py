@@ -11,21 +11,77 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str
 
     DEBUG: bool = False
+    QUERY_BUDGET_CHECK: bool = True
 
     JWT_SECRET: str
     JWT_ALGORITHM: str
+    ## PEM private key and its kid for EdDSA/RS256, retired public keys stay in JWT_PUBLIC_KEYS ({kid: PEM})
+    JWT_PRIVATE_KEY: str | None = None
+    JWT_KEY_ID: str = "default"
+    JWT_PUBLIC_KEYS: dict[str, str] = {}
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 1
+    REFRESH_STORE_MAX_ENTRIES: int = 100000
+    REFRESH_REUSE_GRACE_SECONDS: int = 10
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5.0
+
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
 
     RMQ_HOST: str
     RMQ_PORT: int
     RMQ_VIRTUAL_HOST: str
     RMQ_USER: str
     RMQ_PASSWORD: str
+    RMQ_CHANNEL_POOL_SIZE: int = 4
+    RMQ_PUBLISH_BUFFER_SIZE: int = 10000
+    RMQ_PUBLISH_BUFFER_TIMEOUT: float = 1.0
+    RMQ_PUBLISH_BATCH_SIZE: int = 100
+    RMQ_PUBLISH_BATCH_WINDOW_MS: int = 5
+    RMQ_PUBLISH_RETRIES: int = 5
+    RMQ_SHUTDOWN_TIMEOUT: float = 10.0
+    RMQ_RECONNECT_MAX_DELAY: float = 30.0
+
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_RETENTION_HOURS: int = 24
+    OUTBOX_PURGE_INTERVAL_SECONDS: int = 3600
 
     ACCESS_KEY: str
     SECRET_KEY: str
     BUCKET_NAME: str
     ENDPOINT: str
     PUBLIC_URL: str
+    S3_UPLOAD_CONCURRENCY: int = 4
+    S3_MAX_POOL_CONNECTIONS: int = 32
+    S3_KEEPALIVE_TIMEOUT: float = 60.0
+    S3_CONNECT_TIMEOUT: float = 5.0
+    S3_READ_TIMEOUT: float = 60.0
+    S3_MAX_RETRIES: int = 3
+    ## S3 wants parts of at least 5 MiB, R2 also wants all parts but the last one to have the same size
+    S3_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MULTIPART_CONCURRENCY: int = 4
+    ## how long an object stays unreferenced before reclaim.py deletes it, covers uploads whose row is not committed yet
+    S3_RECLAIM_GRACE_SECONDS: int = 7 * 24 * 3600
+
+    IMAGE_WORKERS: int = 2
+    IMAGE_VARIANT_SIZES: dict[str, int] = {"thumb": 480, "medium": 1280}
+    IMAGE_VARIANT_FORMATS: list[str] = ["webp"]
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_MAX_BYTES: int = 25 * 1024 * 1024
+
+    COUNTER_FLUSH_INTERVAL_MS: int = 500
+    COUNTER_FLUSH_MAX_EVENTS: int = 1000
+
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_MAX_ENTRIES: int = 10000
 
     @property
     def DATABASE_URL_ASYNC(self) -> str:
@@ -0,0 +1,102 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete, event, text
+
+from app_factory import get_application
+from applications.Projects.models_projects import Project, ProjectComments
+from applications.users.models import User
+from database.session_dependencies import async_session_maker, engine
+from services.cache.cache import cache
+
+## The tests run against the database from settings, migrated with `alembic upgrade head`, and are skipped when
+## it cannot be reached. Every test removes the rows it created.
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except Exception as error:
+        pytest.skip(f"database is not available: {error}")
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(database):
+    await cache.backend.close()
+    async with AsyncClient(transport=ASGITransport(app=get_application()), base_url="http://test") as client:
+        yield client
+
+
+## with count_queries() as statements: ... collects every statement the engine runs inside the block
+@pytest.fixture
+def count_queries():
+    @contextmanager
+    def counter():
+        statements = []
+
+        def collect(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", collect)
+        try:
+            yield statements
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", collect)
+
+    return counter
+
+
+class Seed:
+    def __init__(self):
+        self.user_ids: list[int] = []
+        self.project_ids: list[int] = []
+
+    async def user(self) -> User:
+        async with async_session_maker() as session:
+            user = User(name="Test", email=f"{uuid.uuid4()}@test.local", hashed_password="-", is_verified=True)
+            session.add(user)
+            await session.commit()
+        self.user_ids.append(user.id)
+        return user
+
+    async def project(self, user: User, comments: int = 0, category: str = "tests") -> Project:
+        async with async_session_maker() as session:
+            project = Project(
+                user_id=user.id, project_name=f"Test {uuid.uuid4().hex[:8]}", category=category,
+                description="description", technologies="python", detailed_description="details",
+                Additional_information="-", main_image="image.png", images=[],
+            )
+            session.add(project)
+            await session.flush()
+            session.add_all(
+                ProjectComments(user_id=user.id, project_id=project.id, feedback=f"comment {number}")
+                for number in range(comments)
+            )
+            await session.commit()
+        self.project_ids.append(project.id)
+        return project
+
+    async def cleanup(self) -> None:
+        async with async_session_maker() as session:
+            await session.execute(delete(ProjectComments).where(ProjectComments.project_id.in_(self.project_ids)))
+            await session.execute(delete(Project).where(Project.id.in_(self.project_ids)))
+            await session.execute(delete(User).where(User.id.in_(self.user_ids)))
+            await session.commit()
+
+
+@pytest.fixture
+async def seed(database):
+    seed = Seed()
+    yield seed
+    await seed.cleanup()
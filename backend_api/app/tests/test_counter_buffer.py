@@ -0,0 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import select
+
+import services.counters.counter_buffer as counter_buffer
+from applications.Projects.models_projects import Project
+from database.session_dependencies import async_session_maker
+from services.counters.counter_buffer import CounterBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stop_during_slow_flush_keeps_the_deltas(seed, monkeypatch):
+    user = await seed.user()
+    project = await seed.project(user)
+    flushing = asyncio.Event()
+
+    @asynccontextmanager
+    async def slow_session_maker():
+        async with async_session_maker() as session:
+            execute = session.execute
+
+            async def slow_execute(*args, **kwargs):
+                flushing.set()
+                await asyncio.sleep(0.2)
+                return await execute(*args, **kwargs)
+
+            session.execute = slow_execute
+            yield session
+
+    monkeypatch.setattr(counter_buffer, "async_session_maker", slow_session_maker)
+    buffer = CounterBuffer(Project.__table__, "count_of_likes", flush_interval_ms=10, flush_max_events=1000)
+    buffer.start()
+    buffer.add(project.id, 3)
+
+    await asyncio.wait_for(flushing.wait(), timeout=5)
+    await buffer.stop()
+
+    async with async_session_maker() as session:
+        count_of_likes = await session.scalar(select(Project.count_of_likes).where(Project.id == project.id))
+    assert count_of_likes == 3
+    assert buffer.get_pending(project.id) == 0
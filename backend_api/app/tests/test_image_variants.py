@@ -0,0 +1,39 @@
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from services.images.variants import ImageVariants
+from services.s3.s3 import s3_storage
+
+pytestmark = pytest.mark.anyio
+
+
+def make_image() -> UploadFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(buffer, format="PNG")
+    return UploadFile(buffer, size=buffer.tell(), filename="red.png", headers=Headers({"content-type": "image/png"}))
+
+
+async def test_failed_variant_upload_keeps_the_others(monkeypatch):
+    if not ImageVariants.formats:
+        pytest.skip("Pillow was built without the variant formats")
+
+    async def object_exists(key):
+        return False
+
+    async def upload_bytes(key, data, content_type):
+        if key.endswith("/medium.webp"):
+            raise ClientError({"Error": {"Code": "InternalError"}}, "PutObject")
+        return s3_storage.get_url(key)
+
+    monkeypatch.setattr(s3_storage, "object_exists", object_exists)
+    monkeypatch.setattr(s3_storage, "upload_bytes", upload_bytes)
+    source_url = s3_storage.get_url("sha256/red")
+
+    variants = await ImageVariants.create_variants_for_files([make_image()], [source_url])
+
+    assert variants == {source_url: {"thumb.webp": s3_storage.get_url("variants/sha256/red/thumb.webp")}}
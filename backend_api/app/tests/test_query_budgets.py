@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import select
+
+from applications.users.models import User
+from database.query_counter import QueryBudgetExceeded, QueryStats, query_stats
+from database.session_dependencies import async_session_maker
+from services.cache.cache import cache
+from settings import settings
+
+pytestmark = pytest.mark.anyio
+
+
+## The statements of an endpoint must not grow with the rows it returns, and must stay within its query_budget.
+async def get_query_count(client, count_queries, url: str) -> int:
+    await cache.backend.close()
+    with count_queries() as statements:
+        response = await client.get(url)
+    assert response.status_code == 200, response.text
+    assert int(response.headers["X-Query-Count"]) == len(statements)
+    return len(statements)
+
+
+async def test_project_page_does_not_query_per_comment(client, seed, count_queries):
+    user = await seed.user()
+    small = await seed.project(user, comments=1)
+    large = await seed.project(user, comments=15)
+
+    small_count = await get_query_count(client, count_queries, f"/projects/{small.id}/page")
+    large_count = await get_query_count(client, count_queries, f"/projects/{large.id}/page")
+
+    assert small_count == large_count
+    assert large_count <= 5
+
+
+async def test_project_comments_run_one_query(client, seed, count_queries):
+    user = await seed.user()
+    project = await seed.project(user, comments=15)
+
+    assert await get_query_count(client, count_queries, f"/projects/{project.id}/comments") == 1
+    assert await get_query_count(client, count_queries, f"/projects/comments/{project.id}") == 1
+
+
+async def test_project_list_does_not_query_per_project(client, seed, count_queries):
+    user = await seed.user()
+    for _ in range(3):
+        await seed.project(user, category="query-budget")
+
+    one = await get_query_count(client, count_queries, "/projects/?limit=1")
+    three = await get_query_count(client, count_queries, "/projects/?limit=3")
+    by_category = await get_query_count(client, count_queries, "/projects/by_category?category=query-budget")
+
+    assert one == three
+    assert three <= 3
+    assert by_category == 1
+
+
+async def test_project_and_user_lookups(client, seed, count_queries):
+    user = await seed.user()
+    project = await seed.project(user)
+
+    assert await get_query_count(client, count_queries, f"/projects/{project.id}") <= 2
+    assert await get_query_count(client, count_queries, f"/users/{user.id}") <= 2
+
+
+async def test_exceeded_budget_fails_before_commit(seed, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    stats = QueryStats("test")
+    stats.budget = 0
+    token = query_stats.set(stats)
+    try:
+        async with async_session_maker() as session:
+            session.add(User(name="Over budget", email="over-budget@test.local", hashed_password="-"))
+            with pytest.raises(QueryBudgetExceeded):
+                await session.commit()
+    finally:
+        query_stats.reset(token)
+
+    async with async_session_maker() as session:
+        result = await session.execute(select(User).where(User.email == "over-budget@test.local"))
+        assert result.scalar_one_or_none() is None
@@ -0,0 +1,35 @@
+import asyncio
+import socket
+
+import pytest
+
+from services.rabbit.rabbitmq_service import RabbitMQPublisher
+from settings import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def closed_port(monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(settings, "RMQ_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "RMQ_PORT", port)
+
+
+async def test_start_does_not_fail_without_broker(closed_port):
+    publisher = RabbitMQPublisher()
+
+    await asyncio.wait_for(publisher.start(), timeout=5)
+    try:
+        assert publisher.connection is None
+        assert publisher._connecting is not None and not publisher._connecting.done()
+        ## the outbox relay catches this and keeps the events for the next poll
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(publisher.publish_batch([("queue", {})]), timeout=1)
+    finally:
+        await asyncio.wait_for(publisher.stop(), timeout=5)
+
+    assert publisher._connecting is None
+    assert publisher._workers == []
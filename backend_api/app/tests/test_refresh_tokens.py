@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from applications.auth.refresh_tokens import RefreshTokenStore
+from services.cache.cache import MemoryCacheBackend, RedisCacheBackend
+from settings import settings
+
+pytestmark = pytest.mark.anyio
+
+
+## gives the other requests time to read the same state before the first one writes
+class SlowReads:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def get(self, key):
+        value = await self.backend.get(key)
+        await asyncio.sleep(0.01)
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+## the redis case runs against CACHE_REDIS_URL and is skipped when nothing listens there
+@pytest.fixture(params=["memory", "redis"])
+async def store(request):
+    store = RefreshTokenStore()
+    await store.close()
+    if request.param == "redis":
+        store.backend = RedisCacheBackend(settings.CACHE_REDIS_URL, 60)
+        try:
+            await store.backend.client.ping()
+        except Exception as error:
+            await store.close()
+            pytest.skip(f"redis is not available: {error}")
+    else:
+        store.backend = MemoryCacheBackend(100, 60)
+    yield store
+    await store.backend.delete(store.family_key("family"))
+    await store.close()
+
+
+async def test_concurrent_rotations_of_one_jti_issue_one_pair(store):
+    await store.start_family("family", "jti-1")
+    store.backend = SlowReads(store.backend)
+
+    results = await asyncio.gather(
+        *(store.rotate("family", "jti-1", f"jti-2-{number}") for number in range(10)), return_exceptions=True
+    )
+
+    assert results.count(None) == 1
+    assert all(isinstance(result, HTTPException) and result.status_code == 409 for result in results if result)
+    state = await store.backend.get(store.family_key("family"))
+    assert state["jti"] == f"jti-2-{results.index(None)}"
+
+
+async def test_reused_jti_revokes_the_family(store, monkeypatch):
+    monkeypatch.setattr(settings, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    await store.start_family("family", "jti-1")
+    await store.rotate("family", "jti-1", "jti-2")
+
+    with pytest.raises(HTTPException) as reused:
+        await store.rotate("family", "jti-1", "jti-3")
+    with pytest.raises(HTTPException) as revoked:
+        await store.rotate("family", "jti-2", "jti-3")
+
+    assert reused.value.detail == "Refresh token reused"
+    assert revoked.value.detail == "Session expired"
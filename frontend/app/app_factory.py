@@ -1,11 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from backend_api.client import backend_client
+from backend_api.session import refresh_session_middleware
+from backend_api.tokens import token_verifier
 from routers.main_page_router import router
 from settings import settings
 from fastapi.staticfiles import StaticFiles
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await backend_client.start()
+    await token_verifier.refresh_keys()
+    yield
+    await backend_client.close()
+
+
 def get_application() -> FastAPI:
-    app = FastAPI(debug=settings.DEBUG)
+    app = FastAPI(debug=settings.DEBUG, lifespan=lifespan)
     app.include_router(router)
+    app.middleware('http')(refresh_session_middleware)
+
+    if settings.DEBUG:
+        app.add_api_route('/debug/backend_stats', backend_client.get_stats, methods=['GET'])
 
     app.mount('/static', StaticFiles(directory='static'), name='static')
-    return app
\ No newline at end of file
+    return app
@@ -1,266 +1,324 @@
 
 
-import httpx
 from settings import settings
 from fastapi import Request, UploadFile
 
+from backend_api.client import backend_client
+from backend_api.tokens import token_verifier
+
 
 async def login_user(user_email: str, password: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            url=f'{settings.BACKEND_API}/auth/login',
-            data={"username": user_email, 'password': password}
+    client = backend_client.client
+    response = await client.post(
+        url=f'{settings.BACKEND_API}/auth/login',
+        data={"username": user_email, 'password': password}
 
-        )
-        print(response.json())
-        return response.json()
+    )
+    return response.json()
+
+
+async def refresh_tokens(refresh_token: str) -> tuple[int, dict]:
+    client = backend_client.client
+    response = await client.post(
+        url=f'{settings.BACKEND_API}/auth/refresh',
+        json={"refresh_token": refresh_token}
+    )
+    return response.status_code, response.json()
+
+
+async def logout_user(refresh_token: str):
+    client = backend_client.client
+    await client.post(
+        url=f'{settings.BACKEND_API}/auth/logout',
+        json={"refresh_token": refresh_token}
+    )
 
 
 async def register_user(user_email: str, password: str, name: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            url=f'{settings.BACKEND_API}/users/create',
-            json={"name": name, 'password': password, "email": user_email},
-            headers={'Content-Type': 'application/json'}
+    client = backend_client.client
+    response = await client.post(
+        url=f'{settings.BACKEND_API}/users/create',
+        json={"name": name, 'password': password, "email": user_email},
+        headers={'Content-Type': 'application/json'}
 
-        )
-        return response.json()
+    )
+    return response.json()
 
 
 async def get_user_info(access_token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f'{settings.BACKEND_API}/auth/get_my_info',
-            headers={"Authorization": f'Bearer {access_token}'}
+    client = backend_client.client
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/auth/get_my_info',
+        headers={"Authorization": f'Bearer {access_token}'}
 
-        )
-        user_data = response.json()
-        return user_data
+    )
+    user_data = response.json()
+    return user_data
 
 
 async def get_current_user_with_token(request: Request) -> dict:
     access_token = request.cookies.get('access_token')
     if not access_token:
         return {}
-    user = await get_user_info(access_token)
+
+    ## tokens signed with a shared secret have no kid and still have to be checked by the backend
+    if token_verifier.get_key_id(access_token) is None:
+        user = await get_user_info(access_token)
+    else:
+        claims = await token_verifier.verify(access_token)
+        if claims is None:
+            return {}
+        user = {
+            "id": claims.get("user_id"),
+            "name": claims.get("name"),
+            "email": claims.get("user_email"),
+            "is_admin": claims.get("is_admin", False),
+        }
     user['access_token'] = access_token
     return user
 
 
-async def get_projects(q: str = ""):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f'{settings.BACKEND_API}/projects/',
-            params={"q": q}
-
-        )
-        return response.json()
+async def get_projects(q: str = "", cursor: str = "", limit: int = settings.CATALOG_PAGE_SIZE):
+    client = backend_client.client
+    params = {"q": q, "limit": limit, "count_mode": "none"}
+    if cursor:
+        params["cursor"] = cursor
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/projects/',
+        params=params
+    )
+    return response.json()
 
 async def get_project(pk: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f'{settings.BACKEND_API}/projects/{pk}',
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/projects/{pk}',
+    )
+    return response.json()
+
+async def get_project_page(pk: int, token: str | None = None, comments_before: int | None = None):
+    client = backend_client.client
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    params = {"comments_before": comments_before} if comments_before else {}
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/projects/{pk}/page',
+        params=params,
+        headers=headers
+    )
+    return response.json()
 
 async def get_project_by_category(category: str = ""):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f'{settings.BACKEND_API}/projects/by_category',
-            params={"category": category}
+    client = backend_client.client
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/projects/by_category',
+        params={"category": category}
 
-        )
-        return response.json()
+    )
+    return response.json()
 
 
 async def send_comment(access_token: str, restaurant_id: int, text: str, author_name: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.patch(
-            url=f'{settings.BACKEND_API}/users/users/add_comment',
-            json={
-                "restaurant_id": restaurant_id,
-                "text": text,
-                "author_name": author_name
-            },
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.patch(
+        url=f'{settings.BACKEND_API}/users/users/add_comment',
+        json={
+            "restaurant_id": restaurant_id,
+            "text": text,
+            "author_name": author_name
+        },
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    return response.json()
 
 ## current func to create comment
 async def create_comment(project_id: int, feedback: str, token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            url=f'{settings.BACKEND_API}/projects/create_comments',
-            json={
-                'project_id': project_id,
-                'feedback': feedback
-            },
-            headers={
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.post(
+        url=f'{settings.BACKEND_API}/projects/create_comments',
+        json={
+            'project_id': project_id,
+            'feedback': feedback
+        },
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+    )
+    return response.json()
 
 
 
 async def get_all_comments(project_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f"{settings.BACKEND_API}/projects/comments/{project_id}"
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.get(
+        url=f"{settings.BACKEND_API}/projects/comments/{project_id}"
+    )
+    return response.json()
 
 
 async def add_to_favourite(restaurant_id: int, token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            url=f"{settings.BACKEND_API}/restaurants/favourite/{restaurant_id}",
-            headers={
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.post(
+        url=f"{settings.BACKEND_API}/restaurants/favourite/{restaurant_id}",
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+    )
+    return response.json()
 
 async def remove_from_favourite(restaurant_id: int, token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            url=f"{settings.BACKEND_API}/restaurants/favourite/{restaurant_id}",
-            headers={
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.delete(
+        url=f"{settings.BACKEND_API}/restaurants/favourite/{restaurant_id}",
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+    )
+    return response.json()
 
 async def check_if_favourite(restaurant_id: int, token: str) -> bool:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f"{settings.BACKEND_API}/restaurants/favourite/check/{restaurant_id}",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.status_code == 200
+    client = backend_client.client
+    response = await client.get(
+        url=f"{settings.BACKEND_API}/restaurants/favourite/check/{restaurant_id}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    return response.status_code == 200
 
 
 async def get_users_info_for_account(access_token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f'{settings.BACKEND_API}/users/me',
-            headers={"Authorization": f'Bearer {access_token}'}
+    client = backend_client.client
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/users/me',
+        headers={"Authorization": f'Bearer {access_token}'}
 
-        )
-        user_info = response.json()
-        return user_info
+    )
+    user_info = response.json()
+    return user_info
 
 ## TO ADD WITHOUT AVA
 async def edit_users_profile(access_token: str, profile_description: str, name: str, email: str,
                              token: str):
-    async with httpx.AsyncClient() as client:
-        data = {
-            'name': name or "",
-            'profile_description': profile_description or "",
-            'email': email or "",
+    client = backend_client.client
+    data = {
+        'name': name or "",
+        'profile_description': profile_description or "",
+        'email': email or "",
+    }
+
+    response = await client.patch(
+        url=f'{settings.BACKEND_API}/users/settings_upgrade_profile',
+        data=data,
+        headers={
+            'Authorization': f'Bearer {access_token}',
         }
-
-        response = await client.patch(
-            url=f'{settings.BACKEND_API}/users/settings_upgrade_profile',
-            data=data,
-            headers={
-                'Authorization': f'Bearer {access_token}',
-            }
-        )
-        return response.json()
+    )
+    return response.json()
 
 ## TO ADD WITH AVA
 async def edit_users_profile_with_avatar(access_token: str, profile_description: str, name: str, email: str,
                                          user_avatar: UploadFile, token: str):
-    async with httpx.AsyncClient() as client:
-
-        data = {
-            'name': name or "",
-            'profile_description': profile_description or "",
-            'email': email or "",
-        }
-
-        file_content = await user_avatar.read()
-        files = {
-            'user_avatar': (user_avatar.filename, file_content, user_avatar.content_type)
-        }
-
-        response = await client.patch(
-            url=f'{settings.BACKEND_API}/users/settings_upgrade_profile',
-            data=data,
-            files=files,
-            headers={
-                'Authorization': f'Bearer {access_token}',
-            },
-            timeout=30.0
-        )
-        return response.json()
+    client = backend_client.client
+
+    data = {
+        'name': name or "",
+        'profile_description': profile_description or "",
+        'email': email or "",
+    }
+
+    file_content = await user_avatar.read()
+    files = {
+        'user_avatar': (user_avatar.filename, file_content, user_avatar.content_type)
+    }
+
+    response = await client.patch(
+        url=f'{settings.BACKEND_API}/users/settings_upgrade_profile',
+        data=data,
+        files=files,
+        headers={
+            'Authorization': f'Bearer {access_token}',
+        },
+        timeout=30.0
+    )
+    return response.json()
 
 
 async def create_projects(access_token: str, main_image: UploadFile, images: list[UploadFile],
                           name: str, category: str, description: str,
                           technologies: str, detailed_description: str, Additional_information: str):
-    async with httpx.AsyncClient() as client:
-        data = {
-            'name': name,
-            'category': category,
-            'description': description,
-            'technologies': technologies,
-            'detailed_description': detailed_description,
-            'Additional_information': Additional_information
-        }
-
-        files = []
-
-        main_image_content = await main_image.read()
+    client = backend_client.client
+    data = {
+        'name': name,
+        'category': category,
+        'description': description,
+        'technologies': technologies,
+        'detailed_description': detailed_description,
+        'Additional_information': Additional_information
+    }
+
+    files = []
+
+    main_image_content = await main_image.read()
+    files.append(
+        ('main_image', (main_image.filename, main_image_content, main_image.content_type))
+    )
+
+    for image in images:
+        image_content = await image.read()
         files.append(
-            ('main_image', (main_image.filename, main_image_content, main_image.content_type))
+            ('images', (image.filename, image_content, image.content_type))
         )
 
-        for image in images:
-            image_content = await image.read()
-            files.append(
-                ('images', (image.filename, image_content, image.content_type))
-            )
-
-        response = await client.post(
-            url=f'{settings.BACKEND_API}/projects/create',
-            data=data,
-            files=files,
-            headers={'Authorization': f'Bearer {access_token}'},
-            timeout=30.0
-        )
-        return response.json()
+    response = await client.post(
+        url=f'{settings.BACKEND_API}/projects/create',
+        data=data,
+        files=files,
+        headers={'Authorization': f'Bearer {access_token}'},
+        timeout=30.0
+    )
+    return response.json()
 
 async def get_user_by_pk(pk: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url=f'{settings.BACKEND_API}/users/{pk}',
-        )
-        return response.json()
-
-async def like_project(project_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f'{settings.BACKEND_API}/projects/like/{project_id}'
-        )
-        return response.json()
-
-
-async def unlike_project(project_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f'{settings.BACKEND_API}/projects/unlike/{project_id}'
-        )
-        return response.json()
+    client = backend_client.client
+    response = await client.get(
+        url=f'{settings.BACKEND_API}/users/{pk}',
+    )
+    return response.json()
+
+async def like_project(project_id: int, token: str):
+    client = backend_client.client
+    response = await client.post(
+        f'{settings.BACKEND_API}/projects/like/{project_id}',
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    return response.json()
+
+
+async def unlike_project(project_id: int, token: str):
+    client = backend_client.client
+    response = await client.post(
+        f'{settings.BACKEND_API}/projects/unlike/{project_id}',
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    return response.json()
+
+
+async def get_liked_projects(project_ids: list[int], token: str) -> list[int]:
+    client = backend_client.client
+    response = await client.get(
+        f'{settings.BACKEND_API}/projects/liked',
+        params={"project_ids": project_ids},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    if response.status_code != 200:
+        return []
+    return response.json()["liked"]
 
 
 async def get_all_likes_for_project(project_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f'{settings.BACKEND_API}/projects/likes/{project_id}'
-        )
-        return response.json()
\ No newline at end of file
+    client = backend_client.client
+    response = await client.get(
+        f'{settings.BACKEND_API}/projects/likes/{project_id}'
+    )
+    return response.json()
\ No newline at end of file
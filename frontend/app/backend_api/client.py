@@ -0,0 +1,98 @@
+import logging
+import re
+import time
+
+import httpx
+
+from settings import settings
+
+
+class LatencyStats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+## One pooled client for the whole process, so page renders reuse keep-alive connections to the backend
+## instead of paying a TCP handshake per call. Latency is measured until response headers arrive and is
+## grouped by method and path with ids folded into {id}.
+class BackendClient:
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self.stats: dict[str, LatencyStats] = {}
+
+    def create_client(self) -> httpx.AsyncClient:
+        http2 = settings.BACKEND_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logging.warning("BACKEND_HTTP2 is set but h2 is not installed, using HTTP/1.1")
+                http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.BACKEND_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.BACKEND_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.BACKEND_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.BACKEND_TIMEOUT, connect=settings.BACKEND_CONNECT_TIMEOUT),
+            event_hooks={"request": [self.on_request], "response": [self.on_response]},
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self.create_client()
+        return self._client
+
+    async def on_request(self, request: httpx.Request) -> None:
+        request.extensions["started_at"] = time.perf_counter()
+
+    async def on_response(self, response: httpx.Response) -> None:
+        request = response.request
+        started_at = request.extensions.get("started_at")
+        if started_at is None:
+            return
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+        path = re.sub(r'/\d+', '/{id}', request.url.path)
+        key = f'{request.method} {path}'
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = LatencyStats()
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+        if response.status_code >= 500:
+            stats.errors += 1
+
+        if elapsed_ms >= settings.BACKEND_SLOW_CALL_MS:
+            logging.warning("Slow backend call %s: %.1f ms", key, elapsed_ms)
+
+    def get_stats(self) -> dict:
+        return {key: stats.as_dict() for key, stats in sorted(self.stats.items())}
+
+    async def start(self) -> None:
+        _ = self.client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+backend_client = BackendClient()
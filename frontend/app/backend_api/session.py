@@ -0,0 +1,94 @@
+import logging
+import time
+
+import httpx
+import jwt
+from fastapi import Request, Response
+
+from backend_api.api import logout_user, refresh_tokens
+from settings import settings
+
+ACCESS_COOKIE = 'access_token'
+REFRESH_COOKIE = 'refresh_token'
+## the handler revokes the refresh cookie it gets, rotating it first would revoke a token that is already stale
+SKIP_REFRESH_PATHS = ('/logout',)
+
+
+def get_expires_at(token: str) -> float | None:
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        return None
+
+
+def set_auth_cookies(response: Response, tokens: dict) -> None:
+    now = time.time()
+    for cookie in (ACCESS_COOKIE, REFRESH_COOKIE):
+        token = tokens.get(cookie)
+        if not token:
+            continue
+        expires_at = get_expires_at(token)
+        max_age = int(expires_at - now) if expires_at else None
+        response.set_cookie(key=cookie, value=token, httponly=True, samesite='lax', max_age=max_age)
+
+
+def delete_auth_cookies(response: Response) -> None:
+    response.delete_cookie(ACCESS_COOKIE)
+    response.delete_cookie(REFRESH_COOKIE)
+
+
+def deletes_auth_cookies(response: Response) -> bool:
+    for header in response.headers.getlist('set-cookie'):
+        name, _, attributes = header.partition('=')
+        if name in (ACCESS_COOKIE, REFRESH_COOKIE) and 'max-age=0' in attributes.lower():
+            return True
+    return False
+
+
+def needs_refresh(request: Request) -> bool:
+    if not request.cookies.get(REFRESH_COOKIE):
+        return False
+    access_token = request.cookies.get(ACCESS_COOKIE)
+    if not access_token:
+        return True
+    expires_at = get_expires_at(access_token)
+    return expires_at is None or expires_at - time.time() < settings.ACCESS_TOKEN_REFRESH_LEEWAY
+
+
+def replace_request_cookies(request: Request, cookies: dict) -> None:
+    merged = request.cookies | cookies
+    cookie_header = '; '.join(f'{key}={value}' for key, value in merged.items()).encode('latin-1')
+    headers = [(key, value) for key, value in request.scope['headers'] if key != b'cookie']
+    request.scope['headers'] = headers + [(b'cookie', cookie_header)]
+
+
+## Swaps the refresh token for a new pair shortly before the access token runs out, so the handler already
+## sees the fresh access token and the browser gets both cookies back with the response.
+async def refresh_session_middleware(request: Request, call_next):
+    path = request.url.path
+    if path.startswith('/static') or path in SKIP_REFRESH_PATHS or not needs_refresh(request):
+        return await call_next(request)
+
+    try:
+        status_code, tokens = await refresh_tokens(request.cookies[REFRESH_COOKIE])
+    except (httpx.HTTPError, ValueError):
+        logging.exception("Could not refresh the session")
+        status_code, tokens = None, {}
+    if status_code == 200:
+        replace_request_cookies(request, {ACCESS_COOKIE: tokens['access_token']})
+        response = await call_next(request)
+        if deletes_auth_cookies(response):
+            ## the handler signed the user out, the pair rotated for this request must not outlive it
+            try:
+                await logout_user(tokens['refresh_token'])
+            except httpx.HTTPError:
+                logging.exception("Could not revoke the rotated refresh token")
+        else:
+            set_auth_cookies(response, tokens)
+        return response
+
+    response = await call_next(request)
+    ## 409 means a parallel request already rotated the pair and the browser gets it from that response
+    if status_code in (401, 403):
+        delete_auth_cookies(response)
+    return response
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import httpx
+import jwt
+
+from backend_api.client import backend_client
+from settings import settings
+
+
+## Verifies backend access tokens with the public keys from /auth/jwks, so showing who is logged in does not
+## cost a backend call. Keys are refetched when a token names an unknown kid (key rotation), at most once per
+## JWKS_REFRESH_INTERVAL. Verified claims are kept until the token expires.
+class TokenVerifier:
+    def __init__(self):
+        self.keys: dict[str, jwt.PyJWK] = {}
+        self.keys_fetched_at: float | None = None
+        self.keys_lock = asyncio.Lock()
+        self.verified: OrderedDict[str, dict] = OrderedDict()
+
+    def get_key_id(self, token: str) -> str | None:
+        try:
+            return jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError:
+            return None
+
+    def keys_are_fresh(self) -> bool:
+        return (
+            self.keys_fetched_at is not None
+            and time.monotonic() - self.keys_fetched_at < settings.JWKS_REFRESH_INTERVAL
+        )
+
+    async def refresh_keys(self) -> None:
+        async with self.keys_lock:
+            if self.keys_are_fresh():
+                return
+            try:
+                response = await backend_client.client.get(f'{settings.BACKEND_API}/auth/jwks')
+                response.raise_for_status()
+                jwks = response.json()
+            except (httpx.HTTPError, ValueError):
+                logging.exception("Could not fetch backend JWKS")
+                jwks = {"keys": []}
+            self.keys_fetched_at = time.monotonic()
+
+            keys = {}
+            for jwk in jwks["keys"]:
+                if jwk.get("alg") in settings.JWT_ALGORITHMS:
+                    keys[jwk["kid"]] = jwt.PyJWK(jwk)
+            if keys:
+                self.keys = keys
+
+    async def verify(self, token: str) -> dict | None:
+        claims = self.verified.get(token)
+        if claims is not None:
+            if claims["exp"] > time.time():
+                self.verified.move_to_end(token)
+                return claims
+            del self.verified[token]
+            return None
+
+        kid = self.get_key_id(token)
+        if kid not in self.keys and not self.keys_are_fresh():
+            await self.refresh_keys()
+        key = self.keys.get(kid)
+        if key is None:
+            return None
+
+        try:
+            claims = jwt.decode(token, key, algorithms=settings.JWT_ALGORITHMS)
+        except jwt.InvalidTokenError:
+            return None
+        if claims.get("type", "access") != "access":
+            return None
+
+        self.verified[token] = claims
+        if len(self.verified) > settings.AUTH_TOKEN_CACHE_SIZE:
+            self.verified.popitem(last=False)
+        return claims
+
+
+token_verifier = TokenVerifier()
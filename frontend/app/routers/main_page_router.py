@@ -1,17 +1,21 @@
-from fastapi import APIRouter, Request, Form, Depends, status
+import asyncio
+
+from fastapi import APIRouter, Request, Form, Depends, Query, status
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse
 
 from backend_api.api import get_current_user_with_token, login_user, get_projects, get_project, get_user_info, \
     get_project_by_category, get_users_info_for_account, edit_users_profile, edit_users_profile_with_avatar, \
-    create_projects, get_user_by_pk, like_project, unlike_project, get_all_likes_for_project
+    create_projects, get_user_by_pk, like_project, unlike_project, get_all_likes_for_project, get_liked_projects, \
+    get_project_page
 
 import humanize
 from datetime import datetime
 from fastapi.responses import HTMLResponse
 from fastapi import HTTPException, UploadFile, File
 from backend_api.api import register_user, send_comment, get_all_comments, create_comment, add_to_favourite, \
-    remove_from_favourite, check_if_favourite
+    remove_from_favourite, check_if_favourite, logout_user
+from backend_api.session import REFRESH_COOKIE, delete_auth_cookies, set_auth_cookies
 from fastapi.responses import JSONResponse
 
 router = APIRouter()
@@ -19,16 +23,39 @@ router = APIRouter()
 templates = Jinja2Templates(directory='templates')
 
 
+## Keyset pages only link forward, so the cursors of the pages before travel along in prev (comma separated,
+## an empty entry is the first page) and the previous link pops the last one.
+def get_catalog_pagination(request: Request, query: str, cursor: str, prev: str, next_cursor: str | None) -> dict:
+    index_url = request.url_for('index')
+    trail = prev.split(',') if cursor else []
+    pagination = {'next_page_url': None, 'prev_page_url': None}
+    if next_cursor:
+        pagination['next_page_url'] = index_url.include_query_params(
+            q=query, cursor=next_cursor, prev=','.join([*trail, cursor])
+        )
+    if cursor:
+        pagination['prev_page_url'] = index_url.include_query_params(
+            q=query, cursor=trail[-1], prev=','.join(trail[:-1])
+        )
+    return pagination
+
+
 @router.get('/')
 @router.post('/')
 async def index(request: Request,
                 category: str = Form(''),
                 query: str = Form(''),
+                q: str = Query(''),
+                cursor: str = Query(''),
+                prev: str = Query(''),
                 user: dict = Depends(get_current_user_with_token)):
+    query = query or q
+    pagination = {}
     if category:
         projects_response = await get_project_by_category(category=category)
     else:
-        projects_response = await get_projects(query)
+        projects_response = await get_projects(query, cursor=cursor)
+        pagination = get_catalog_pagination(request, query, cursor, prev, projects_response.get('next_cursor'))
 
     projects = projects_response['items']
     show_not_found = query and not projects
@@ -38,7 +65,8 @@ async def index(request: Request,
         'restaurants': projects,
         'selected_category': category,
         'query': query,
-        'show_not_found': show_not_found
+        'show_not_found': show_not_found,
+        **pagination,
     }
 
     if user.get('name'):
@@ -68,15 +96,17 @@ templates.env.filters["naturaltime"] = naturaltime
 async def restaurant_detail(
         request: Request,
         project_id: int,
-
+        comments_before: int | None = None,
 ):
-    project = await  get_project(project_id)
-    comments = await get_all_comments(project_id)
+    project = await get_project_page(project_id, request.cookies.get("access_token"), comments_before)
 
     return templates.TemplateResponse("project_detail.html", {
         "request": request,
         "project": project,
-        "comments": comments,
+        "comments": project.get("comments", []),
+        "comments_total": project.get("comments_total", 0),
+        "comments_next_cursor": project.get("comments_next_cursor"),
+        "comments_before": comments_before,
     })
 
 
@@ -126,8 +156,7 @@ async def get_all_comments_for_project(
         project_id: int,
 
 ):
-    project = await  get_project(project_id)
-    comments = await get_all_comments(project_id)
+    project, comments = await asyncio.gather(get_project(project_id), get_all_comments(project_id))
 
     return templates.TemplateResponse("project_detail.html", {
         "request": request,
@@ -166,7 +195,7 @@ async def login(request: Request, user: dict = Depends(get_current_user_with_tok
 
     if request.method == "GET":
         response = templates.TemplateResponse('login.html', context=context)
-        response.delete_cookie('access_token')
+        delete_auth_cookies(response)
         return response
 
     user_tokens = await login_user(user_email, password)
@@ -177,15 +206,19 @@ async def login(request: Request, user: dict = Depends(get_current_user_with_tok
         return templates.TemplateResponse('login.html', context=context)
 
     response = RedirectResponse(redirect_url, status_code=status.HTTP_303_SEE_OTHER)
-    response.set_cookie(key="access_token", value=access_token, httponly=True, max_age=60 * 5)
+    set_auth_cookies(response, user_tokens)
     return response
 
 
 @router.get('/logout')
 async def logout(request: Request):
+    refresh_token = request.cookies.get(REFRESH_COOKIE)
+    if refresh_token:
+        await logout_user(refresh_token)
+
     redirect_url = request.url_for("login")
     response = RedirectResponse(redirect_url, status_code=status.HTTP_303_SEE_OTHER)
-    response.delete_cookie('access_token')
+    delete_auth_cookies(response)
     return response
 
 
@@ -206,15 +239,14 @@ async def register(
 
     if request.method == "GET":
         response = templates.TemplateResponse('register.html', context=context)
-        response.delete_cookie('access_token')
+        delete_auth_cookies(response)
         return response
 
     created_user = await register_user(user_email=user_email, password=password, name=user_name)
     if created_user.get('email'):
         user_tokens = await login_user(user_email, password)
-        access_token = user_tokens.get('access_token')
         response = RedirectResponse(redirect_url, status_code=status.HTTP_303_SEE_OTHER)
-        response.set_cookie(key="access_token", value=access_token, httponly=True, max_age=60 * 5)
+        set_auth_cookies(response, user_tokens)
         return response
 
     context['errors'] = [created_user['detail']]
@@ -416,33 +448,42 @@ async def create_project_endpoint(
 
 @router.post("/projects/like/{project_id}")
 async def like_projects(project_id: int, request: Request):
-    await like_project(project_id)
-    likes_count = await get_all_likes_for_project(project_id)
+    token = request.cookies.get("access_token")
+    if not token:
+        return JSONResponse({"ok": False}, status_code=status.HTTP_401_UNAUTHORIZED)
+
+    like_state = await like_project(project_id, token)
 
     return JSONResponse({
-        "ok": True,
-        "likes_count": likes_count,
-        "is_liked": True
+        "ok": "count_of_likes" in like_state,
+        "likes_count": like_state.get("count_of_likes"),
+        "is_liked": like_state.get("is_liked", False)
     })
 
 
 @router.post("/projects/unlike/{project_id}")
 async def unlike_projects(project_id: int, request: Request):
-    await unlike_project(project_id)
-    likes_count = await get_all_likes_for_project(project_id)
+    token = request.cookies.get("access_token")
+    if not token:
+        return JSONResponse({"ok": False}, status_code=status.HTTP_401_UNAUTHORIZED)
+
+    like_state = await unlike_project(project_id, token)
 
     return JSONResponse({
-        "ok": True,
-        "likes_count": likes_count,
-        "is_liked": False
+        "ok": "count_of_likes" in like_state,
+        "likes_count": like_state.get("count_of_likes"),
+        "is_liked": like_state.get("is_liked", False)
     })
 
 
 @router.get("/projects/likes/{project_id}")
-async def get_likes_for_project(project_id: int):
+async def get_likes_for_project(project_id: int, request: Request):
     likes_count = await get_all_likes_for_project(project_id)
 
+    token = request.cookies.get("access_token")
+    is_liked = bool(token) and project_id in await get_liked_projects([project_id], token)
+
     return JSONResponse({
         "likes_count": likes_count,
-        "is_liked": False
+        "is_liked": is_liked
     })
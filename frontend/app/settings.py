@@ -7,6 +7,20 @@ class Settings(BaseSettings):
 
     DEBUG: bool = False
     BACKEND_API: str
+    BACKEND_MAX_CONNECTIONS: int = 100
+    BACKEND_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    BACKEND_KEEPALIVE_EXPIRY: float = 30.0
+    BACKEND_TIMEOUT: float = 10.0
+    BACKEND_CONNECT_TIMEOUT: float = 2.0
+    BACKEND_HTTP2: bool = False
+    BACKEND_SLOW_CALL_MS: float = 500.0
+
+    JWT_ALGORITHMS: list[str] = ["EdDSA", "RS256"]
+    JWKS_REFRESH_INTERVAL: float = 60.0
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    ACCESS_TOKEN_REFRESH_LEEWAY: int = 60
+
+    CATALOG_PAGE_SIZE: int = 12
 
 
 
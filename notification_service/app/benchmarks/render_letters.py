@@ -0,0 +1,41 @@
+import argparse
+import os
+import time
+
+import jinja2
+
+## settings are read on import, rendering does not touch the broker or the SMTP account
+for name in ("RMQ_HOST", "RMQ_PORT", "RMQ_VIRTUAL_HOST", "RMQ_USER", "RMQ_PASSWORD", "TOKEN_UKR_NET", "USER",
+             "SMTP_SERVER"):
+    os.environ.setdefault(name, "0" if name == "RMQ_PORT" else "benchmark")
+
+from services.rabbit.handlers import USER_REGISTER_TEMPLATE  # noqa: E402
+from settings import settings  # noqa: E402
+from utils.email_sender import create_letter  # noqa: E402
+
+PARAMS = {"name": "Benchmark", "email": "benchmark@test.local", "redirect_url": "http://localhost/verify/1"}
+
+
+## what create_letter did before the module-level environment: a new Environment and loader per letter
+def create_letter_uncached(params: dict, template: str) -> str:
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath=settings.TEMPLATES_DIR))
+    return env.get_template(f'{template}.html').render(params)
+
+
+def measure(render, letters: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(letters):
+        render(PARAMS, USER_REGISTER_TEMPLATE)
+    return (time.perf_counter() - started_at) / letters
+
+
+## cd notification_service/app && python -m benchmarks.render_letters --letters 10000
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-letter render cost of create_letter")
+    parser.add_argument("--letters", type=int, default=10000)
+    args = parser.parse_args()
+
+    create_letter(PARAMS, USER_REGISTER_TEMPLATE)
+    for label, render in (("new environment per letter", create_letter_uncached), ("create_letter", create_letter)):
+        per_letter = measure(render, args.letters)
+        print(f"{label:<28} {per_letter * 1_000_000:10.1f} us/letter  {args.letters} letters")
@@ -1,12 +1,26 @@
-from services.rabbit.rabbitmq_service import rabbitmq_broker
+import asyncio
+import signal
 
+from services.digest.scheduler import digest_scheduler
+from services.rabbit.constants import SupportedQueues
+from services.rabbit.rabbitmq_service import rabbitmq_consumer
+from utils.email_sender import preload_templates, smtp_pool
 
-def main():
-    print(888888888888888888888888)
-    with rabbitmq_broker.get_connection() as connection:
-        with connection.channel() as channel:
-            rabbitmq_broker.consume_message(channel)
+
+async def main():
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    preload_templates(SupportedQueues.get_templates())
+    digest_scheduler.start()
+    await rabbitmq_consumer.start()
+    await stop_event.wait()
+    await rabbitmq_consumer.stop()
+    await digest_scheduler.stop()
+    await smtp_pool.close()
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import logging
+
+import aio_pika
+
+from services.rabbit.constants import SupportedQueues
+from services.rabbit.rabbitmq_service import ATTEMPTS_HEADER, ERROR_HEADER, dead_letter_queue_name, rabbitmq_consumer
+
+
+## python replay.py user_registration --limit 100
+## moves parked messages from <queue>.dead back to <queue> with a fresh attempts counter
+async def replay(queue_name: str, limit: int | None) -> int:
+    connection = await rabbitmq_consumer.get_connection()
+    replayed = 0
+    async with connection:
+        channel = await connection.channel(publisher_confirms=True)
+        dead_queue = await channel.declare_queue(dead_letter_queue_name(queue_name), durable=True)
+        while limit is None or replayed < limit:
+            message = await dead_queue.get(fail=False)
+            if message is None:
+                break
+            headers = dict(message.headers or {})
+            headers.pop(ATTEMPTS_HEADER, None)
+            headers.pop(ERROR_HEADER, None)
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    message.body,
+                    headers=headers,
+                    content_type=message.content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                ),
+                routing_key=queue_name,
+            )
+            await message.ack()
+            replayed += 1
+    return replayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay dead-lettered notification messages")
+    parser.add_argument("queue", choices=SupportedQueues.get_queues())
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    count = asyncio.run(replay(args.queue, args.limit))
+    logging.warning("Replayed %s messages to %s", count, args.queue)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from settings import settings
+from utils.email_sender import create_letter, send_email
+
+DIGEST_TEMPLATE = 'digest'
+
+
+class RecipientDigest:
+    __slots__ = ("name", "opened_at", "comments", "likes", "followers", "followers_count")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.opened_at = time.monotonic()
+        self.comments: dict[int, dict] = {}
+        self.likes: dict[int, dict] = {}
+        self.followers: list[str] = []
+        self.followers_count = 0
+
+    def merge(self, other: "RecipientDigest") -> None:
+        for project_id, comments in other.comments.items():
+            current = self.comments.setdefault(project_id, {**comments, "count": 0, "latest": deque(maxlen=3)})
+            current["count"] += comments["count"]
+            current["latest"].extend(comments["latest"])
+        for project_id, likes in other.likes.items():
+            self.add_like(project_id, likes["project_name"], likes["count_of_likes"])
+        for follower_name in other.followers:
+            self.add_follower(follower_name)
+        self.followers_count += other.followers_count - len(other.followers)
+
+    def add_comment(self, project_id: int, project_name: str, commenter_name: str, text: str) -> None:
+        comments = self.comments.setdefault(
+            project_id, {"project_name": project_name, "count": 0, "latest": deque(maxlen=3)}
+        )
+        comments["count"] += 1
+        comments["latest"].append({"commenter_name": commenter_name, "text": text})
+
+    def add_like(self, project_id: int, project_name: str, count_of_likes: int) -> None:
+        likes = self.likes.setdefault(project_id, {"project_name": project_name, "count_of_likes": 0})
+        likes["count_of_likes"] = max(likes["count_of_likes"], count_of_likes)
+
+    def add_follower(self, follower_name: str) -> None:
+        self.followers_count += 1
+        if len(self.followers) < 10:
+            self.followers.append(follower_name)
+
+    def get_context(self) -> dict:
+        return {
+            "name": self.name,
+            "comments": [{**comments, "latest": list(comments["latest"])} for comments in self.comments.values()],
+            "likes": list(self.likes.values()),
+            "followers": self.followers,
+            "followers_count": self.followers_count,
+        }
+
+
+def is_like_milestone(count_of_likes: int) -> bool:
+    milestones = settings.DIGEST_LIKE_MILESTONES
+    if count_of_likes in milestones:
+        return True
+    return count_of_likes > milestones[-1] and count_of_likes % milestones[-1] == 0
+
+
+## Events are grouped per recipient email; the first event opens a DIGEST_WINDOW_SECONDS window and when it
+## closes the recipient gets one letter for everything collected. Events live in memory only, the queue
+## message is acked once it is buffered, so a crash loses at most one window. stop() flushes what is left.
+class DigestScheduler:
+    def __init__(self):
+        self.pending: dict[str, RecipientDigest] = {}
+        self.task: asyncio.Task | None = None
+
+    def get_digest(self, email: str, name: str) -> RecipientDigest:
+        digest = self.pending.get(email)
+        if digest is None:
+            digest = self.pending[email] = RecipientDigest(name)
+        return digest
+
+    def add_comment(self, email: str, name: str, project_id: int, project_name: str, commenter_name: str, text: str):
+        self.get_digest(email, name).add_comment(project_id, project_name, commenter_name, text)
+
+    def add_like(self, email: str, name: str, project_id: int, project_name: str, count_of_likes: int):
+        if is_like_milestone(count_of_likes):
+            self.get_digest(email, name).add_like(project_id, project_name, count_of_likes)
+
+    def add_follower(self, email: str, name: str, follower_name: str):
+        self.get_digest(email, name).add_follower(follower_name)
+
+    async def send_digest(self, email: str, digest: RecipientDigest) -> None:
+        letter = create_letter(digest.get_context(), DIGEST_TEMPLATE)
+        try:
+            await send_email([email], mail_body=letter, mail_subject="Новини ваших проєктів")
+        except Exception:
+            ## keep the events for the next window instead of dropping them
+            logging.exception("Digest for %s failed", email)
+            self.get_digest(email, digest.name).merge(digest)
+
+    async def flush(self, force: bool = False) -> None:
+        deadline = time.monotonic() - settings.DIGEST_WINDOW_SECONDS
+        due = [email for email, digest in self.pending.items() if force or digest.opened_at <= deadline]
+        if not due:
+            return
+        digests = [(email, self.pending.pop(email)) for email in due]
+        await asyncio.gather(*[self.send_digest(email, digest) for email, digest in digests])
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.DIGEST_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Digest flush failed")
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush(force=True)
+
+
+digest_scheduler = DigestScheduler()
@@ -1,21 +1,45 @@
 from enum import StrEnum
-from typing import Callable, Self
+from typing import Awaitable, Callable, Self
 
-from services.rabbit.handlers import register_user, user_added_product_to_cart
+from services.digest.scheduler import DIGEST_TEMPLATE
+from services.rabbit.handlers import (
+    USER_REGISTER_TEMPLATE,
+    project_commented,
+    project_liked,
+    register_user,
+    user_added_product_to_cart,
+    user_followed,
+)
 
 
 class SupportedQueues(StrEnum):
     USER_REGISTRATION = 'user_registration'
     USER_ADDED_PRODUCT_TO_CART = 'user_added_product_to_cart'
+    PROJECT_COMMENTED = 'project_commented'
+    PROJECT_LIKED = 'project_liked'
+    USER_FOLLOWED = 'user_followed'
 
     @classmethod
     def get_queues(cls) -> list[str]:
         return list(cls)
 
     @classmethod
-    def get_handler(cls, queue_name: Self) -> Callable:
+    def get_handler(cls, queue_name: Self) -> Callable[[bytes], Awaitable[None]]:
         handlers_map = {
             cls.USER_REGISTRATION: register_user,
-            cls.USER_ADDED_PRODUCT_TO_CART: user_added_product_to_cart
+            cls.USER_ADDED_PRODUCT_TO_CART: user_added_product_to_cart,
+            cls.PROJECT_COMMENTED: project_commented,
+            cls.PROJECT_LIKED: project_liked,
+            cls.USER_FOLLOWED: user_followed,
         }
-        return handlers_map[queue_name]
\ No newline at end of file
+        return handlers_map[queue_name]
+
+    @classmethod
+    def get_templates(cls) -> list[str]:
+        templates_map = {
+            cls.USER_REGISTRATION: USER_REGISTER_TEMPLATE,
+            cls.PROJECT_COMMENTED: DIGEST_TEMPLATE,
+            cls.PROJECT_LIKED: DIGEST_TEMPLATE,
+            cls.USER_FOLLOWED: DIGEST_TEMPLATE,
+        }
+        return list(set(templates_map.values()))
@@ -1,25 +1,54 @@
-import pika
 import logging
 import json
+from services.digest.scheduler import digest_scheduler
 from utils.email_sender import create_letter, send_email
 
+USER_REGISTER_TEMPLATE = 'user_register'
 
-def register_user(channel: pika.adapters.blocking_connection.BlockingChannel, method, properties, body):
-    logging.warning(body)
+
+async def register_user(body: bytes):
     payload = body.decode(encoding="utf-8")
     logging.warning(payload)
-    logging.warning(type(payload))
     payload_json = json.loads(payload)
 
     user_email = payload_json['email']
 
-    letter = create_letter(payload_json, 'user_register')
-    logging.warning(letter)
+    letter = create_letter(payload_json, USER_REGISTER_TEMPLATE)
+
+    await send_email([user_email], mail_body=letter, mail_subject="Registration")
+
+
+async def user_added_product_to_cart(body: bytes):
+    pass
+
+
+async def project_commented(body: bytes):
+    payload = json.loads(body)
+    digest_scheduler.add_comment(
+        payload['owner_email'],
+        payload['owner_name'],
+        project_id=payload['project_id'],
+        project_name=payload['project_name'],
+        commenter_name=payload['commenter_name'],
+        text=payload['text'],
+    )
 
-    send_email([user_email], mail_body=letter, mail_subject="Registration")
 
-    channel.basic_ack(delivery_tag=method.delivery_tag)
+async def project_liked(body: bytes):
+    payload = json.loads(body)
+    digest_scheduler.add_like(
+        payload['owner_email'],
+        payload['owner_name'],
+        project_id=payload['project_id'],
+        project_name=payload['project_name'],
+        count_of_likes=payload['count_of_likes'],
+    )
 
 
-def user_added_product_to_cart(channel: pika.adapters.blocking_connection.BlockingChannel, method, properties, body):
-    channel.basic_ack(delivery_tag=method.delivery_tag)
\ No newline at end of file
+async def user_followed(body: bytes):
+    payload = json.loads(body)
+    digest_scheduler.add_follower(
+        payload['owner_email'],
+        payload['owner_name'],
+        follower_name=payload['follower_name'],
+    )
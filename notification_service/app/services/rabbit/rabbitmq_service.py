@@ -1,57 +1,147 @@
-import pika
+import asyncio
+import logging
 import ssl
+from typing import Awaitable, Callable
+
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage, AbstractQueue, AbstractRobustConnection
 
 from services.rabbit.constants import SupportedQueues
 from settings import settings
-import json
 
 
-class RabbitMQBroker:
+ATTEMPTS_HEADER = 'x-attempts'
+ERROR_HEADER = 'x-last-error'
+
+
+def retry_queue_name(queue_name: str, level: int) -> str:
+    return f'{queue_name}.retry.{level}'
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    return f'{queue_name}.dead'
+
+
+def get_attempts(message: AbstractIncomingMessage) -> int:
+    return int((message.headers or {}).get(ATTEMPTS_HEADER, 0))
+
+
+## Every queue gets its own channel with basic_qos prefetch and at most RMQ_QUEUE_CONCURRENCY handlers running,
+## so a slow handler only holds back its own queue. Messages are acked after the handler finished.
+## A failed message is acked too and republished to <queue>.retry.<n>: those queues have no consumers, a message
+## waits there for its TTL and is dead-lettered back to <queue>. Delay doubles per level, after RMQ_MAX_ATTEMPTS
+## the message is parked in <queue>.dead until replay.py puts it back.
+class RabbitMQConsumer:
     def __init__(self):
-        ssl_context = ssl.create_default_context()
+        self.connection: AbstractRobustConnection | None = None
+        self.publish_channel: AbstractChannel | None = None
+        self.consumers: list[tuple[AbstractQueue, str]] = []
+        self.in_flight: set[asyncio.Task] = set()
 
-        self.connection_params = pika.ConnectionParameters(
+    async def get_connection(self) -> AbstractRobustConnection:
+        return await aio_pika.connect_robust(
             host=settings.RMQ_HOST,
             port=settings.RMQ_PORT,
-            virtual_host=settings.RMQ_VIRTUAL_HOST,
-            credentials=pika.PlainCredentials(username=settings.RMQ_USER, password=settings.RMQ_PASSWORD),
-            ssl_options=pika.SSLOptions(context=ssl_context)
+            virtualhost=settings.RMQ_VIRTUAL_HOST,
+            login=settings.RMQ_USER,
+            password=settings.RMQ_PASSWORD,
+            ssl=True,
+            ssl_context=ssl.create_default_context(),
         )
 
-    def get_connection(self) -> pika.BlockingConnection:
-        return pika.BlockingConnection(parameters=self.connection_params)
+    async def setup_queue(self, queue_name: str) -> AbstractQueue:
+        channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=settings.RMQ_PREFETCH_COUNT)
+        queue = await channel.declare_queue(queue_name, durable=True)
 
-    def send_message(self, message: dict, queue_name: str):
-        with self.get_connection() as connection:
-            with connection.channel() as channel:
-                channel.queue_declare(queue=queue_name)
+        for level in range(settings.RMQ_RETRY_LEVELS):
+            await channel.declare_queue(
+                retry_queue_name(queue_name, level),
+                durable=True,
+                arguments={
+                    'x-message-ttl': settings.RMQ_RETRY_BASE_DELAY_MS * 2**level,
+                    'x-dead-letter-exchange': '',
+                    'x-dead-letter-routing-key': queue_name,
+                },
+            )
+        await channel.declare_queue(dead_letter_queue_name(queue_name), durable=True)
+        return queue
+
+    async def start(self) -> None:
+        self.connection = await self.get_connection()
+        self.publish_channel = await self.connection.channel(publisher_confirms=True)
+        for queue_name in SupportedQueues.get_queues():
+            queue = await self.setup_queue(queue_name)
+            handler = SupportedQueues.get_handler(queue_name)
+            slots = asyncio.Semaphore(settings.RMQ_QUEUE_CONCURRENCY)
+            consumer_tag = await queue.consume(self.get_callback(handler, slots))
+            self.consumers.append((queue, consumer_tag))
 
-                message_json_str = json.dumps(message)
+    def get_callback(self, handler: Callable[[bytes], Awaitable[None]], slots: asyncio.Semaphore):
+        async def on_message(message: AbstractIncomingMessage) -> None:
+            await slots.acquire()
+            task = asyncio.create_task(self.process_message(handler, message, slots))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
 
-                channel.basic_publish(
-                    exchange='',
-                    routing_key=queue_name,
-                    body=message_json_str.encode()
-                )
+        return on_message
 
-    def setup_queues(self, channel: pika.adapters.blocking_connection.BlockingChannel, queues: list[str]):
-        for queue in queues:
-            channel.queue_declare(queue=queue, durable=True)
+    async def process_message(
+        self, handler: Callable[[bytes], Awaitable[None]], message: AbstractIncomingMessage, slots: asyncio.Semaphore
+    ) -> None:
+        try:
+            await handler(message.body)
+            await message.ack()
+        except Exception as exc:
+            logging.exception("Handler for %s failed", message.routing_key)
+            await self.schedule_retry(message, exc)
+        finally:
+            slots.release()
 
-    def consume_message(self, channel: pika.adapters.blocking_connection.BlockingChannel):
-        queues = SupportedQueues.get_queues()
-        self.setup_queues(channel, queues)
-        print(5555555555)
+    async def schedule_retry(self, message: AbstractIncomingMessage, exc: Exception) -> None:
+        queue_name = message.routing_key
+        attempts = get_attempts(message) + 1
+        if attempts >= settings.RMQ_MAX_ATTEMPTS:
+            target = dead_letter_queue_name(queue_name)
+            logging.error("%s failed %s times, moving it to %s", queue_name, attempts, target)
+        else:
+            target = retry_queue_name(queue_name, min(attempts, settings.RMQ_RETRY_LEVELS) - 1)
 
-        for queue in queues:
-            print(queue, 32323233232)
-            channel.basic_consume(
-                queue=queue,
-                on_message_callback=SupportedQueues.get_handler(queue),
+        headers = dict(message.headers or {})
+        headers[ATTEMPTS_HEADER] = attempts
+        headers[ERROR_HEADER] = repr(exc)[:256]
+        try:
+            await self.publish_channel.default_exchange.publish(
+                aio_pika.Message(
+                    message.body,
+                    headers=headers,
+                    content_type=message.content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                ),
+                routing_key=target,
             )
+        except Exception:
+            ## the broker is not reachable either, keep the message where it is
+            logging.exception("Could not move %s message to %s", queue_name, target)
+            await message.nack(requeue=True)
+            return
+        await message.ack()
+
+    async def stop(self) -> None:
+        ## stop deliveries first, then let the running handlers finish and ack
+        for queue, consumer_tag in self.consumers:
+            await queue.cancel(consumer_tag)
+        self.consumers = []
 
-        channel.start_consuming()
+        if self.in_flight:
+            _, pending = await asyncio.wait(self.in_flight, timeout=settings.RMQ_SHUTDOWN_TIMEOUT)
+            if pending:
+                logging.error("%s messages were still in progress on shutdown", len(pending))
 
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+            self.publish_channel = None
 
 
-rabbitmq_broker = RabbitMQBroker()
\ No newline at end of file
+rabbitmq_consumer = RabbitMQConsumer()
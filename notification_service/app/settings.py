@@ -10,10 +10,28 @@ class Settings(BaseSettings):
     RMQ_VIRTUAL_HOST: str
     RMQ_USER: str
     RMQ_PASSWORD: str
+    RMQ_PREFETCH_COUNT: int = 20
+    RMQ_QUEUE_CONCURRENCY: int = 10
+    RMQ_SHUTDOWN_TIMEOUT: float = 30.0
+    RMQ_MAX_ATTEMPTS: int = 6
+    RMQ_RETRY_LEVELS: int = 5
+    RMQ_RETRY_BASE_DELAY_MS: int = 5000
 
     TOKEN_UKR_NET: str
     USER: str
     SMTP_SERVER: str
+    SMTP_PORT: int = 465
+    SMTP_USE_SSL: bool = True
+    SMTP_POOL_SIZE: int = 3
+    SMTP_TIMEOUT: float = 30.0
+    SMTP_NOOP_INTERVAL: float = 30.0
+
+    DIGEST_WINDOW_SECONDS: int = 900
+    DIGEST_FLUSH_INTERVAL_SECONDS: float = 10.0
+    DIGEST_LIKE_MILESTONES: list[int] = [1, 10, 25, 50, 100, 250, 500, 1000]
+
+    TEMPLATES_DIR: str = 'templates'
+    TEMPLATES_BYTECODE_CACHE_DIR: str | None = None
 
 
 
@@ -0,0 +1,79 @@
+import os
+import socket
+from pathlib import Path
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+## settings are read on import, the tests only need placeholders for the broker and the real SMTP account
+for name, value in {
+    "RMQ_HOST": "localhost", "RMQ_PORT": "5672", "RMQ_VIRTUAL_HOST": "/", "RMQ_USER": "guest",
+    "RMQ_PASSWORD": "guest", "TOKEN_UKR_NET": "secret", "USER": "sender@test.local", "SMTP_SERVER": "127.0.0.1",
+}.items():
+    os.environ.setdefault(name, value)
+## the service runs from app/, the tests may run from anywhere
+os.environ.setdefault("TEMPLATES_DIR", str(Path(__file__).parents[1] / "templates"))
+
+from settings import settings  # noqa: E402
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.envelopes = []
+        self.logins = 0
+        self.rejected: set[str] = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rejected:
+            return '550 Mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return '250 Message accepted for delivery'
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        self.logins += 1
+        return AuthResult(success=True)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+## A local SMTP server standing in for the mail provider, without TLS so no certificate is needed.
+## restart() drops every open session the way the provider does with idle ones.
+class SMTPStandIn:
+    def __init__(self):
+        self.handler = RecordingHandler()
+        self.port = get_free_port()
+        self.controller = None
+
+    def start(self) -> None:
+        self.controller = Controller(
+            self.handler, hostname="127.0.0.1", port=self.port, authenticator=self.handler.authenticate,
+            auth_require_tls=False,
+        )
+        self.controller.start()
+
+    def stop(self) -> None:
+        self.controller.stop()
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = SMTPStandIn()
+    monkeypatch.setattr(settings, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", server.port)
+    monkeypatch.setattr(settings, "SMTP_USE_SSL", False)
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from settings import settings
+from utils.email_sender import SMTPConnectionPool, SMTPSendError, build_message
+
+
+def make_message(recipient: str):
+    return build_message([recipient], mail_body="<p>Hello</p>", mail_subject="Test")
+
+
+def test_letters_reuse_one_logged_in_session(smtp_server):
+    handler = smtp_server.handler
+    pool = SMTPConnectionPool(1)
+
+    async def send():
+        for number in range(3):
+            await pool.send_messages([make_message(f"user{number}@test.local")])
+        await pool.close()
+
+    asyncio.run(send())
+
+    assert handler.logins == 1
+    assert [envelope.rcpt_tos for envelope in handler.envelopes] == [
+        ["user0@test.local"], ["user1@test.local"], ["user2@test.local"]
+    ]
+
+
+def test_batch_is_sent_over_one_session(smtp_server):
+    handler = smtp_server.handler
+    pool = SMTPConnectionPool(2)
+
+    async def send():
+        await pool.send_messages([make_message(f"user{number}@test.local") for number in range(5)])
+        await pool.close()
+
+    asyncio.run(send())
+
+    assert handler.logins == 1
+    assert len(handler.envelopes) == 5
+
+
+def test_dropped_session_is_closed_and_replaced(smtp_server, monkeypatch):
+    handler = smtp_server.handler
+    pool = SMTPConnectionPool(1)
+    closed = []
+    close_connection = pool.close_connection
+
+    def record_close(connection):
+        closed.append(connection)
+        close_connection(connection)
+
+    monkeypatch.setattr(pool, "close_connection", record_close)
+
+    async def send():
+        await pool.send_messages([make_message("first@test.local")])
+        first = pool.slots._queue[0]
+        smtp_server.restart()
+        await pool.send_messages([make_message("second@test.local")])
+        second = pool.slots._queue[0]
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(send())
+
+    assert first is not second
+    assert closed[0] is first
+    assert first.smtp.sock is None
+    assert handler.logins == 2
+    assert [envelope.rcpt_tos for envelope in handler.envelopes] == [["first@test.local"], ["second@test.local"]]
+
+
+def test_stale_session_is_checked_with_noop(smtp_server, monkeypatch):
+    handler = smtp_server.handler
+    monkeypatch.setattr(settings, "SMTP_NOOP_INTERVAL", 0)
+    pool = SMTPConnectionPool(1)
+
+    async def send():
+        await pool.send_messages([make_message("first@test.local")])
+        await pool.send_messages([make_message("second@test.local")])
+        await pool.close()
+
+    asyncio.run(send())
+
+    assert handler.logins == 1
+    assert len(handler.envelopes) == 2
+
+
+def test_failed_batch_reports_the_sent_letters(smtp_server):
+    handler = smtp_server.handler
+    handler.rejected.add("user2@test.local")
+    pool = SMTPConnectionPool(1)
+    messages = [make_message(f"user{number}@test.local") for number in range(4)]
+
+    async def send():
+        try:
+            with pytest.raises(SMTPSendError) as error:
+                await pool.send_messages(messages)
+            assert pool.slots._queue[0] is None
+            await pool.send_messages(error.value.unsent[1:])
+        finally:
+            await pool.close()
+        return error.value
+
+    error = asyncio.run(send())
+
+    assert error.sent == messages[:2]
+    assert error.unsent == messages[2:]
+    assert [envelope.rcpt_tos for envelope in handler.envelopes] == [
+        ["user0@test.local"], ["user1@test.local"], ["user3@test.local"]
+    ]
+
+
+def test_new_session_is_closed_when_its_letter_fails(smtp_server, monkeypatch):
+    handler = smtp_server.handler
+    handler.rejected.add("second@test.local")
+    pool = SMTPConnectionPool(1)
+    opened = []
+    connect = pool.connect
+
+    def record_connect():
+        opened.append(connect())
+        return opened[-1]
+
+    monkeypatch.setattr(pool, "connect", record_connect)
+
+    async def send():
+        await pool.send_messages([make_message("first@test.local")])
+        smtp_server.restart()
+        with pytest.raises(SMTPSendError):
+            await pool.send_messages([make_message("second@test.local")])
+        await pool.close()
+
+    asyncio.run(send())
+
+    assert len(opened) == 2
+    assert all(connection.smtp.sock is None for connection in opened)
@@ -0,0 +1,54 @@
+from datetime import date
+
+import utils.email_sender as email_sender
+from services.digest.scheduler import DIGEST_TEMPLATE, RecipientDigest
+from services.rabbit.constants import SupportedQueues
+from services.rabbit.handlers import USER_REGISTER_TEMPLATE
+
+PARAMS = {"name": "Test", "email": "test@test.local", "redirect_url": "http://localhost/verify/1"}
+
+
+def count_loads(monkeypatch) -> list[str]:
+    env = email_sender.get_template_env()
+    loads = []
+    get_source = env.loader.get_source
+
+    def counting_get_source(environment, template):
+        loads.append(template)
+        return get_source(environment, template)
+
+    monkeypatch.setattr(env.loader, "get_source", counting_get_source)
+    monkeypatch.setattr(email_sender, "template_env", env)
+    return loads
+
+
+## the benchmark for the render cost is benchmarks/render_letters.py
+def test_template_is_loaded_once_for_many_letters(monkeypatch):
+    loads = count_loads(monkeypatch)
+
+    letters = [email_sender.create_letter(PARAMS, USER_REGISTER_TEMPLATE) for _ in range(1000)]
+
+    assert loads == [f"{USER_REGISTER_TEMPLATE}.html"]
+    assert "http://localhost/verify/1" in letters[-1]
+
+
+def test_preloaded_templates_are_not_loaded_again(monkeypatch):
+    loads = count_loads(monkeypatch)
+
+    email_sender.preload_templates(SupportedQueues.get_templates())
+    preloaded = list(loads)
+    email_sender.create_letter(PARAMS, USER_REGISTER_TEMPLATE)
+
+    assert f"{USER_REGISTER_TEMPLATE}.html" in preloaded
+    assert loads == preloaded
+
+
+def test_letters_show_the_current_year():
+    digest = RecipientDigest("Test")
+    digest.add_follower("Follower")
+
+    for letter in (
+        email_sender.create_letter(PARAMS, USER_REGISTER_TEMPLATE),
+        email_sender.create_letter(digest.get_context(), DIGEST_TEMPLATE),
+    ):
+        assert f"© {date.today().year} " in letter
@@ -1,5 +1,8 @@
+import asyncio
 import os
 import smtplib
+import time
+from datetime import date
 from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
@@ -10,17 +13,15 @@ import jinja2
 from settings import settings
 
 
-def send_email(
+def build_message(
     recipients: list[str],
     /,
     *,
     mail_body: str,
     mail_subject: str,
     attachment: str = None,
-):
-    TOKEN = settings.TOKEN_UKR_NET
+) -> MIMEMultipart:
     USER = settings.USER
-    SMTP_SERVER = settings.SMTP_SERVER
 
     msg = MIMEMultipart('alternative')
     msg['Subject'] = mail_subject
@@ -49,16 +50,145 @@ def send_email(
             encoders.encode_base64(file)
             msg.attach(file)
 
-    mail = smtplib.SMTP_SSL(SMTP_SERVER)
-    mail.login(USER, TOKEN)
-    mail.sendmail(USER, recipients, msg.as_string())
-    mail.quit()
+    return msg
+
+
+class SMTPSendError(Exception):
+    def __init__(self, sent: list[MIMEMultipart], unsent: list[MIMEMultipart]):
+        super().__init__(f"{len(unsent)} of {len(sent) + len(unsent)} letters were not sent")
+        self.sent = sent
+        self.unsent = unsent
+
+
+class PooledSMTP:
+    __slots__ = ("smtp", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+
+## Keeps up to SMTP_POOL_SIZE logged in sessions, so TLS and AUTH are paid once per connection instead of
+## once per letter. smtplib is blocking, every session is driven from a worker thread.
+class SMTPConnectionPool:
+    def __init__(self, size: int):
+        self.slots: asyncio.Queue[PooledSMTP | None] = asyncio.Queue()
+        for _ in range(size):
+            self.slots.put_nowait(None)
+
+    def connect(self) -> PooledSMTP:
+        if settings.SMTP_USE_SSL:
+            smtp = smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+        smtp.login(settings.USER, settings.TOKEN_UKR_NET)
+        return PooledSMTP(smtp)
+
+    def is_alive(self, connection: PooledSMTP) -> bool:
+        if time.monotonic() - connection.last_used < settings.SMTP_NOOP_INTERVAL:
+            return True
+        try:
+            return connection.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close_connection(self, connection: PooledSMTP) -> None:
+        try:
+            connection.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.smtp.close()
+
+    ## Any failure closes the session in use, the stale one passed in as well as one opened here, and raises
+    ## SMTPSendError telling which letters already went out, so a retry only sends the rest.
+    def send_all(self, connection: PooledSMTP | None, messages: list[MIMEMultipart]) -> PooledSMTP:
+        sent = 0
+        try:
+            if connection is not None and not self.is_alive(connection):
+                self.close_connection(connection)
+                connection = None
+            if connection is None:
+                connection = self.connect()
+
+            for message in messages:
+                recipients = message['To'].split(', ')
+                try:
+                    connection.smtp.sendmail(settings.USER, recipients, message.as_string())
+                except smtplib.SMTPServerDisconnected:
+                    ## the server dropped the idle session, close our end of the socket before replacing it
+                    self.close_connection(connection)
+                    connection = None
+                    connection = self.connect()
+                    connection.smtp.sendmail(settings.USER, recipients, message.as_string())
+                connection.last_used = time.monotonic()
+                sent += 1
+        except Exception as error:
+            if connection is not None:
+                self.close_connection(connection)
+            raise SMTPSendError(messages[:sent], messages[sent:]) from error
+        return connection
+
+    async def send_messages(self, messages: list[MIMEMultipart]) -> None:
+        connection = await self.slots.get()
+        try:
+            connection = await asyncio.to_thread(self.send_all, connection, messages)
+        except BaseException:
+            ## send_all closed the session on failure. When the caller was cancelled the worker thread still owns it
+            ## and there is no result to put back, the slot opens a new one next time.
+            connection = None
+            raise
+        finally:
+            self.slots.put_nowait(connection)
+
+    async def close(self) -> None:
+        while not self.slots.empty():
+            connection = self.slots.get_nowait()
+            if connection is not None:
+                await asyncio.to_thread(self.close_connection, connection)
+
+
+smtp_pool = SMTPConnectionPool(settings.SMTP_POOL_SIZE)
+
+
+async def send_email(
+    recipients: list[str],
+    /,
+    *,
+    mail_body: str,
+    mail_subject: str,
+    attachment: str = None,
+):
+    message = build_message(recipients, mail_body=mail_body, mail_subject=mail_subject, attachment=attachment)
+    await smtp_pool.send_messages([message])
+
+
+async def send_emails(messages: list[MIMEMultipart]):
+    await smtp_pool.send_messages(messages)
+
+
+def get_template_env() -> jinja2.Environment:
+    bytecode_cache = None
+    if settings.TEMPLATES_BYTECODE_CACHE_DIR:
+        os.makedirs(settings.TEMPLATES_BYTECODE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(settings.TEMPLATES_BYTECODE_CACHE_DIR)
+
+    ## templates only change with a deploy, so skip the mtime check on every get_template
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(searchpath=settings.TEMPLATES_DIR),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+    )
+
+
+template_env = get_template_env()
+
+
+def preload_templates(templates: list[str]) -> None:
+    for template in templates:
+        template_env.get_template(f'{template}.html')
 
 
 def create_letter(params: dict, template: str) -> str:
-    template_loader = jinja2.FileSystemLoader(searchpath='./')
-    template_env = jinja2.Environment(loader=template_loader)
-    template_file = f'templates/{template}.html'
-    template = template_env.get_template(template_file)
-    output = template.render(params)
-    return output
\ No newline at end of file
+    template = template_env.get_template(f'{template}.html')
+    ## the footer of every letter shows the year, taken per render so a long running worker never goes stale
+    output = template.render({"current_year": date.today().year, **params})
+    return output